@@ -9,9 +9,43 @@ cache = Cache("cache")
 outputDir = Path("output")
 outputDir.mkdir(exist_ok=True)
 outputGTFS = outputDir / "gtfs-tczew.zip"
+GTFS_COMPRESSION_LEVEL = 9  # zlib level for DEFLATE, 0-9
+GTFS_ZIP_WORKERS = 4  # threads compressing zip members, 1 to compress serially
 
 OPENSTREETMAP_DOMAIN = "https://www.openstreetmap.org"
 OVERPASS_URL = None  # "https://gis-serwer.pl/osm/api/interpreter"
+# Download ways with inline geometry instead of all their nodes.
+# Off until checked against a production Overpass instance.
+OVERPASS_GEOMETRY_QUERY = False
+OVERPASS_TIMEOUT_SECONDS = 250  # server side, [timeout:] of queries
+# Fetch from the OpenStreetMap API, slower, when Overpass fails.
+OSM_API_FALLBACK = True
+# Read OSM data from a local .osm or .osm.pbf extract instead of Overpass,
+# e.g. Path("pomorskie-latest.osm.pbf"). PBF requires the pbf extra (osmium).
+OSM_EXTRACT_PATH = None
+
+HTTP_TIMEOUT_SECONDS = 30.0
+HTTP_MAX_CONNECTIONS = 16
+HTTP2 = False  # requires h2 package
+
+TCZEW_API_MAX_CONCURRENCY = 16
+TCZEW_API_RATE_PER_SECOND = 10.0
+TCZEW_API_BURST = 20
+# Requests allowed to fail after retries before the whole run is aborted.
+TCZEW_API_ERROR_BUDGET = 20
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_BASE_SECONDS = 0.5
+HTTP_BACKOFF_MAX_SECONDS = 30.0
+# Evict cached timetables when GetTimetableInformation changes between runs.
+TCZEW_REFRESH_ON_TIMETABLE_CHANGE = True
+
+HOUR_SECONDS = 60 * 60
+DAY_SECONDS = 24 * HOUR_SECONDS
+CACHE_EXPIRE_TIMETABLE_INFORMATION = HOUR_SECONDS
+CACHE_EXPIRE_TIMETABLE = 30 * DAY_SECONDS
+CACHE_EXPIRE_NEXT_DEPARTURES = 60
+CACHE_EXPIRE_OSM_API = 7 * DAY_SECONDS
+CACHE_EXPIRE_SNAPSHOT = 30 * DAY_SECONDS
 
 TIMEZONE = "Europe/Warsaw"
 timezone = pytz.timezone(TIMEZONE)
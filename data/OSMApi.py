@@ -1,46 +1,115 @@
-import httpx
+import hashlib
+from typing import Dict, Iterable, List, Tuple
 
-from configuration import OPENSTREETMAP_DOMAIN, cache
+from configuration import CACHE_EXPIRE_OSM_API, OPENSTREETMAP_DOMAIN, cache
 from data.OSMSource import Node, OSMSource, Relation, RelationMember, Way
+from network import getJson
 
 OPENSTREETMAP_API = f"{OPENSTREETMAP_DOMAIN}/api/0.6"
+# Ids per multi-fetch request, keeps URLs well below server limits.
+MULTI_FETCH_CHUNK_SIZE = 500
+
+ElementKey = Tuple[str, int]
 
 
 class OSMApi(OSMSource):
     def __init__(self, mainRelationId: int):
         super().__init__(mainRelationId)
+        # Raw elements from bulk responses, keyed by (type, id).
+        self.elements: Dict[ElementKey, dict] = dict()
+
+    # Static, so that cache keys do not include the element index.
+    @staticmethod
+    @cache.memoize(expire=CACHE_EXPIRE_OSM_API)
+    def _fetchRelationFull(relationId: int) -> List[dict]:
+        url = f"{OPENSTREETMAP_API}/relation/{relationId}/full.json"
+        return getJson(url, expire=CACHE_EXPIRE_OSM_API)["elements"]
+
+    @staticmethod
+    @cache.memoize(expire=CACHE_EXPIRE_OSM_API)
+    def _fetchMultiple(elementType: str, elementIds: Tuple[int, ...]) -> List[dict]:
+        ids = ",".join(str(elementId) for elementId in elementIds)
+        url = f"{OPENSTREETMAP_API}/{elementType}s.json?{elementType}s={ids}"
+        return getJson(url, expire=CACHE_EXPIRE_OSM_API)["elements"]
+
+    def _index(self, elements: List[dict]):
+        for element in elements:
+            self.elements[(element["type"], element["id"])] = element
+
+    def _load(self, elementType: str, elementIds: Iterable[int]):
+        missing = sorted(
+            {
+                elementId
+                for elementId in elementIds
+                if (elementType, elementId) not in self.elements
+            }
+        )
+        for start in range(0, len(missing), MULTI_FETCH_CHUNK_SIZE):
+            chunk = tuple(missing[start : start + MULTI_FETCH_CHUNK_SIZE])
+            self._index(self._fetchMultiple(elementType, chunk))
+
+    def _loadRelationTree(self, relationId: int):
+        # full.json has the relation, its members and nodes of member ways,
+        # but only the member list of member relations.
+        loaded = set()
+        queue = [relationId]
+        while queue:
+            currentId = queue.pop()
+            if currentId in loaded:
+                continue
+            loaded.add(currentId)
+            self._index(self._fetchRelationFull(currentId))
+            queue.extend(
+                member["ref"]
+                for member in self.elements[("relation", currentId)]["members"]
+                if member["type"] == "relation"
+            )
+
+    def snapshotInputs(self) -> Tuple:
+        self._loadRelationTree(self.mainRelationId)
+        content = repr(sorted(self.elements.items()))
+        return OPENSTREETMAP_API, hashlib.sha256(content.encode()).hexdigest()
+
+    def _element(self, elementType: str, elementId: int) -> dict:
+        key = (elementType, elementId)
+        if key not in self.elements:
+            self._load(elementType, [elementId])
+        return self.elements[key]
 
     def fetchWay(self, wayId: int) -> Way:
-        way = self._fetchWay(wayId)
+        way = self._element("way", wayId)
+        self._load("node", way["nodes"])
         return Way(
             type=way["type"],
             id=way["id"],
-            tags=way["tags"],
-            nodes=[self.fetchNode(nodeId=nodeId) for nodeId in way["nodes"]],
+            tags=way.get("tags", dict()),
+            nodes=[
+                self.fetchElement(elementId=nodeId, elementType="node")
+                for nodeId in way["nodes"]
+            ],
         )
 
-    @cache.memoize()
-    def _fetchWay(self, wayId: int):
-        url = f"{OPENSTREETMAP_API}/way/{wayId}.json"
-        return httpx.get(url).json()["elements"][0]
-
     def fetchNode(self, nodeId: int) -> Node:
-        node = self._fetchNode(nodeId)
+        node = self._element("node", nodeId)
         return Node(
             type=node["type"],
             id=node["id"],
-            tags=node["tags"] if "tags" in node else dict(),
+            tags=node.get("tags", dict()),
             lat=node["lat"],
             lon=node["lon"],
         )
 
-    @cache.memoize()
-    def _fetchNode(self, nodeId: int):
-        url = f"{OPENSTREETMAP_API}/node/{nodeId}.json"
-        return httpx.get(url).json()["elements"][0]
-
     def fetchRelation(self, relationId: int) -> Relation:
-        relation = self._fetchRelation(relationId)
+        relation = self._element("relation", relationId)
+        for elementType in ["node", "way", "relation"]:
+            self._load(
+                elementType,
+                [
+                    member["ref"]
+                    for member in relation["members"]
+                    if member["type"] == elementType
+                ],
+            )
         return Relation(
             type=relation["type"],
             id=relation["id"],
@@ -55,10 +124,9 @@ class OSMApi(OSMSource):
                 )
                 for member in relation["members"]
             ],
-            tags=relation["tags"],
+            tags=relation.get("tags", dict()),
         )
 
-    @cache.memoize()
-    def _fetchRelation(self, relationId: int):
-        url = f"{OPENSTREETMAP_API}/relation/{relationId}.json"
-        return httpx.get(url).json()["elements"][0]
+    def savePublicTransportRelation(self):
+        self._loadRelationTree(self.mainRelationId)
+        super().savePublicTransportRelation()
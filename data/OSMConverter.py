@@ -7,7 +7,7 @@ from gtfs.GTFSConverter import (
     GTFSService,
     GTFSShape,
     GTFSStop,
-    GTFSStopTime,
+    GTFSStopTimes,
     GTFSTrip,
     RouteId,
     RouteVariantId,
@@ -15,8 +15,9 @@ from gtfs.GTFSConverter import (
     TripId,
     shapesFromRouteVariants,
 )
+from data.OSMShapeBuilder import routeGeometry
 from data.OSMSource import Node, OSMSource, Relation, Way
-from data.TransportData import LatLon
+from data.TransportData import PackedLatLons
 from log import printError, printWarning
 
 GTFS_TRIP_ID_TAG = "gtfs:trip_id"
@@ -86,15 +87,13 @@ class OSMConverter(GTFSConverter):
         return result
 
     @staticmethod
-    def _extractRouteGeometry(osmRoute: Relation) -> List[LatLon]:
-        result = []
-        for member in osmRoute.members:
-            if member.role != "" or member.type != "way":
-                continue
-            way = cast(Way, member.element)
-            for node in way.nodes:
-                result.append(LatLon(latitude=node.lat, longitude=node.lon))
-        return result
+    def _extractRouteGeometry(osmRoute: Relation) -> PackedLatLons:
+        ways = [
+            cast(Way, member.element)
+            for member in osmRoute.members
+            if member.role == "" and member.type == "way"
+        ]
+        return routeGeometry(osmRoute.id, ways)
 
     @staticmethod
     def _extractBusStopIds(osmRoute: Relation) -> List[StopId]:
@@ -149,5 +148,5 @@ class OSMConverter(GTFSConverter):
         routes: Dict[RouteId, GTFSRoute],
         routeVariants: Dict[RouteVariantId, GTFSRouteVariant],
         trips: Dict[TripId, GTFSTrip],
-    ) -> List[GTFSStopTime]:
-        return []
+    ) -> GTFSStopTimes:
+        return GTFSStopTimes()
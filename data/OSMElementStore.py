@@ -0,0 +1,119 @@
+import hashlib
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data.OSMSource import Node
+
+Tags = Dict[str, str]
+Member = Tuple[str, int, str]  # type, ref, role
+MEMBER_TYPES = ["node", "way", "relation"]
+
+
+class OSMElementStore:
+    # Compact form of an OSM extract which pickles without per-element objects:
+    # packed ids and coordinates, way nodes and relation members in flat arrays
+    # with offsets, tags only for tagged nodes.
+    def __init__(self) -> None:
+        self.nodeIds = array("q")
+        self.nodeCoordinates = array("d")  # lat, lon pairs
+        self.nodeTags: Dict[int, Tags] = dict()
+        self.wayIds = array("q")
+        self.wayTags: List[Tags] = []
+        self.wayNodeOffsets = array("q", [0])
+        self.wayNodeIds = array("q")
+        self.relationIds = array("q")
+        self.relationTags: List[Tags] = []
+        self.memberOffsets = array("q", [0])
+        self.memberTypes = array("b")
+        self.memberRefs = array("q")
+        self.memberRoles: List[str] = []
+        self._positions: Optional[Dict[Tuple[str, int], int]] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_positions"] = None
+        return state
+
+    def contentHash(self) -> str:
+        contentHash = hashlib.sha256()
+        for column in [
+            self.nodeIds,
+            self.nodeCoordinates,
+            self.wayIds,
+            self.wayNodeOffsets,
+            self.wayNodeIds,
+            self.relationIds,
+            self.memberOffsets,
+            self.memberTypes,
+            self.memberRefs,
+        ]:
+            contentHash.update(column.tobytes())
+        tags = (
+            sorted(self.nodeTags.items()),
+            self.wayTags,
+            self.relationTags,
+            self.memberRoles,
+        )
+        contentHash.update(repr(tags).encode())
+        return contentHash.hexdigest()
+
+    def addNode(self, nodeId: int, lat: float, lon: float, tags: Tags):
+        self.nodeIds.append(nodeId)
+        self.nodeCoordinates.extend((lat, lon))
+        if tags:
+            self.nodeTags[nodeId] = tags
+
+    def addWay(self, wayId: int, nodeIds: Iterable[int], tags: Tags):
+        self.wayIds.append(wayId)
+        self.wayTags.append(tags)
+        self.wayNodeIds.extend(nodeIds)
+        self.wayNodeOffsets.append(len(self.wayNodeIds))
+
+    def addRelation(self, relationId: int, members: Iterable[Member], tags: Tags):
+        self.relationIds.append(relationId)
+        self.relationTags.append(tags)
+        for memberType, ref, role in members:
+            self.memberTypes.append(MEMBER_TYPES.index(memberType))
+            self.memberRefs.append(ref)
+            self.memberRoles.append(sys.intern(role))
+        self.memberOffsets.append(len(self.memberRefs))
+
+    def _position(self, elementType: str, elementId: int) -> int:
+        if self._positions is None:
+            self._positions = dict()
+            for positionType, ids in [
+                ("node", self.nodeIds),
+                ("way", self.wayIds),
+                ("relation", self.relationIds),
+            ]:
+                for position, positionId in enumerate(ids):
+                    self._positions[(positionType, positionId)] = position
+        return self._positions[(elementType, elementId)]
+
+    def node(self, nodeId: int) -> Node:
+        position = self._position("node", nodeId)
+        return Node(
+            type="node",
+            id=nodeId,
+            lat=self.nodeCoordinates[2 * position],
+            lon=self.nodeCoordinates[2 * position + 1],
+            tags=self.nodeTags.get(nodeId, dict()),
+        )
+
+    def way(self, wayId: int) -> Tuple[Tags, Sequence[int]]:
+        position = self._position("way", wayId)
+        start, end = self.wayNodeOffsets[position], self.wayNodeOffsets[position + 1]
+        return self.wayTags[position], self.wayNodeIds[start:end]
+
+    def relation(self, relationId: int) -> Tuple[Tags, List[Member]]:
+        position = self._position("relation", relationId)
+        start, end = self.memberOffsets[position], self.memberOffsets[position + 1]
+        return self.relationTags[position], [
+            (
+                MEMBER_TYPES[self.memberTypes[index]],
+                self.memberRefs[index],
+                self.memberRoles[index],
+            )
+            for index in range(start, end)
+        ]
@@ -0,0 +1,59 @@
+from abc import abstractmethod
+from typing import Optional, Tuple
+
+from data.OSMElementStore import OSMElementStore
+from data.OSMSource import Node, OSMSource, Relation, RelationMember, Way
+
+
+class OSMElementStoreSource(OSMSource):
+    def __init__(self, mainRelationId: int) -> None:
+        super().__init__(mainRelationId)
+        self.elementStore: Optional[OSMElementStore] = None
+
+    @abstractmethod
+    def loadElementStore(self) -> OSMElementStore:
+        raise NotImplementedError
+
+    def _loadedElementStore(self) -> OSMElementStore:
+        if self.elementStore is None:
+            self.elementStore = self.loadElementStore()
+        return self.elementStore
+
+    def snapshotInputs(self) -> Tuple:
+        return (self._loadedElementStore().contentHash(),)
+
+    def fetchNode(self, nodeId: int) -> Node:
+        return self.elementStore.node(nodeId)
+
+    def fetchWay(self, wayId: int) -> Way:
+        tags, nodeIds = self.elementStore.way(wayId)
+        return Way(
+            id=wayId,
+            type="way",
+            tags=tags,
+            nodes=[
+                self.fetchElement(elementId=nodeId, elementType="node")
+                for nodeId in nodeIds
+            ],
+        )
+
+    def fetchRelation(self, relationId: int) -> Relation:
+        tags, members = self.elementStore.relation(relationId)
+        return Relation(
+            id=relationId,
+            type="relation",
+            tags=tags,
+            members=[
+                RelationMember(
+                    ref=ref,
+                    type=memberType,
+                    role=role,
+                    element=self.fetchElement(elementType=memberType, elementId=ref),
+                )
+                for memberType, ref, role in members
+            ],
+        )
+
+    def savePublicTransportRelation(self):
+        self._loadedElementStore()
+        super().savePublicTransportRelation()
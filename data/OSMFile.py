@@ -0,0 +1,140 @@
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from xml.etree import ElementTree
+
+from configuration import CACHE_EXPIRE_SNAPSHOT, cache
+from data.OSMElementStore import OSMElementStore, Tags
+from data.OSMElementStoreSource import OSMElementStoreSource
+from log import printInfo
+
+# id, tags and coordinates for nodes, node ids for ways, members for relations
+FileElement = Tuple[int, Tags, Any]
+OSMIUM_MEMBER_TYPES = dict(n="node", w="way", r="relation")
+
+
+def _readXml(path: Path, elementType: str) -> Iterator[FileElement]:
+    context = ElementTree.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event != "end" or element.tag not in ("node", "way", "relation"):
+            continue
+        if element.tag == elementType:
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            if elementType == "node":
+                data = (float(element.get("lat")), float(element.get("lon")))
+            elif elementType == "way":
+                data = [int(nd.get("ref")) for nd in element.iter("nd")]
+            else:
+                data = [
+                    (member.get("type"), int(member.get("ref")), member.get("role"))
+                    for member in element.iter("member")
+                ]
+            yield int(element.get("id")), tags, data
+        # Finished elements are dropped, so memory does not grow with the file.
+        root.clear()
+
+
+def _readPbf(path: Path, elementType: str) -> Iterator[FileElement]:
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError(
+            "Reading .osm.pbf files requires osmium, install the pbf extra"
+        ) from e
+    entities = dict(
+        node=osmium.osm.NODE, way=osmium.osm.WAY, relation=osmium.osm.RELATION
+    )[elementType]
+    for element in osmium.FileProcessor(str(path), entities):
+        # osmium objects are only valid during iteration, so everything is copied.
+        tags = {tag.k: tag.v for tag in element.tags}
+        if elementType == "node":
+            data = (element.location.lat, element.location.lon)
+        elif elementType == "way":
+            data = [node.ref for node in element.nodes]
+        else:
+            data = [
+                (OSMIUM_MEMBER_TYPES[member.type], member.ref, member.role)
+                for member in element.members
+            ]
+        yield element.id, tags, data
+
+
+def _readElements(path: Path, elementType: str) -> Iterator[FileElement]:
+    if path.name.endswith(".osm.pbf"):
+        return _readPbf(path, elementType)
+    return _readXml(path, elementType)
+
+
+def _relationTree(relations: OSMElementStore, mainRelationId: int) -> Set[int]:
+    # Children can appear before or after their parents in the file,
+    # so the tree is only known once all relations are read.
+    childRelationIds: Dict[int, List[int]] = dict()
+    for relationId in relations.relationIds:
+        _, members = relations.relation(relationId)
+        children = [ref for memberType, ref, _ in members if memberType == "relation"]
+        if children:
+            childRelationIds[relationId] = children
+    result = set()
+    stack = [mainRelationId]
+    while stack:
+        relationId = stack.pop()
+        if relationId not in result:
+            result.add(relationId)
+            stack.extend(childRelationIds.get(relationId, []))
+    return result
+
+
+def loadElementStore(path: Path, mainRelationId: int) -> OSMElementStore:
+    # One pass per element type. All relations of the file are kept packed,
+    # they are few compared to ways and nodes.
+    relations = OSMElementStore()
+    for relationId, tags, members in _readElements(path, "relation"):
+        relations.addRelation(relationId, members, tags)
+    relationIds = _relationTree(relations, mainRelationId)
+    elementStore = OSMElementStore()
+    wayIds: Set[int] = set()
+    nodeIds: Set[int] = set()
+    for relationId in relations.relationIds:
+        if relationId in relationIds:
+            tags, members = relations.relation(relationId)
+            elementStore.addRelation(relationId, members, tags)
+            for memberType, ref, _ in members:
+                if memberType == "way":
+                    wayIds.add(ref)
+                elif memberType == "node":
+                    nodeIds.add(ref)
+    for wayId, tags, wayNodeIds in _readElements(path, "way"):
+        if wayId in wayIds:
+            elementStore.addWay(wayId, wayNodeIds, tags)
+            nodeIds.update(wayNodeIds)
+    for nodeId, tags, (lat, lon) in _readElements(path, "node"):
+        if nodeId in nodeIds:
+            elementStore.addNode(nodeId, lat, lon, tags)
+    printInfo(
+        f"Loaded {len(elementStore.relationIds)} relations, "
+        f"{len(elementStore.wayIds)} ways and {len(elementStore.nodeIds)} nodes "
+        f"from {path}"
+    )
+    return elementStore
+
+
+class OSMFile(OSMElementStoreSource):
+    def __init__(self, mainRelationId: int, path: Path) -> None:
+        super().__init__(mainRelationId)
+        self.path = path
+
+    def _fileVersion(self) -> Tuple:
+        stat = self.path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def loadElementStore(self) -> OSMElementStore:
+        # Keyed by path, with the file version checked on load, so that
+        # a newer extract under the same name replaces the previous store.
+        key = ("osm-file", self.mainRelationId, str(self.path.resolve()))
+        fileVersion = self._fileVersion()
+        cached = cache.get(key)
+        if cached is not None and cached[0] == fileVersion:
+            return cached[1]
+        elementStore = loadElementStore(self.path, self.mainRelationId)
+        cache.set(key, (fileVersion, elementStore), expire=CACHE_EXPIRE_SNAPSHOT)
+        return elementStore
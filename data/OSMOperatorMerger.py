@@ -1,5 +1,5 @@
 from itertools import zip_longest
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from rich.table import Table
 
@@ -13,7 +13,7 @@ from gtfs.GTFSConverter import (
     GTFSService,
     GTFSShape,
     GTFSStop,
-    GTFSStopTime,
+    GTFSStopTimes,
     GTFSTrip,
     RouteId,
     RouteVariantId,
@@ -38,6 +38,17 @@ class OSMOperatorMerger(GTFSConverter):
         self.matchedOperatorToOSMVariantIds: Dict[RouteVariantId, RouteVariantId] = (
             dict()
         )
+        # Lookups of OSM data when ids do not match, lists keep duplicates.
+        self.osmVariantsByBusStopIds: Dict[
+            Tuple[StopId, ...], List[GTFSRouteVariant]
+        ] = dict()
+        for osmRouteVariant in self.osmData.routeVariants.values():
+            self.osmVariantsByBusStopIds.setdefault(
+                tuple(osmRouteVariant.busStopIds), []
+            ).append(osmRouteVariant)
+        self.osmRoutesByName: Dict[str, List[GTFSRoute]] = dict()
+        for osmRoute in self.osmData.routes.values():
+            self.osmRoutesByName.setdefault(osmRoute.routeName, []).append(osmRoute)
 
     @staticmethod
     def _validateStopOSM(stop):
@@ -107,12 +118,7 @@ class OSMOperatorMerger(GTFSConverter):
             operatorRoute = self.operatorData.routes.get(ref)
             osmRoute = self.osmData.routes.get(ref)
             if osmRoute is None and operatorRoute is not None:
-                matchedRoutes = list(
-                    filter(
-                        lambda route: route.routeName == operatorRoute.routeName,
-                        self.osmData.routes.values(),
-                    )
-                )
+                matchedRoutes = self.osmRoutesByName.get(operatorRoute.routeName, [])
                 if len(matchedRoutes) == 1:
                     osmRoute = matchedRoutes[0]
                     printInfo(
@@ -198,12 +204,8 @@ class OSMOperatorMerger(GTFSConverter):
                 printWarning(
                     f"Missing variant {variantId} for route {operatorVariant.routeId} in OSM"
                 )
-                osmVariantByBusStopIds = list(
-                    filter(
-                        lambda osmRouteVariant: osmRouteVariant.busStopIds
-                        == operatorVariant.busStopIds,
-                        self.osmData.routeVariants.values(),
-                    )
+                osmVariantByBusStopIds = self.osmVariantsByBusStopIds.get(
+                    tuple(operatorVariant.busStopIds), []
                 )
                 if len(osmVariantByBusStopIds) > 1:
                     printError(
@@ -270,7 +272,7 @@ class OSMOperatorMerger(GTFSConverter):
         routes: Dict[RouteId, GTFSRoute],
         routeVariants: Dict[RouteVariantId, GTFSRouteVariant],
         trips: Dict[TripId, GTFSTrip],
-    ) -> List[GTFSStopTime]:
+    ) -> GTFSStopTimes:
         return self.operatorData.stopTimes
 
     def _compareRouteVariants(
@@ -1,87 +1,163 @@
+from typing import Dict, List, Optional, Tuple
+
+import httpx
 import overpy
 
-from configuration import OVERPASS_URL, cache
-from data.OSMSource import Node, OSMSource, Relation, RelationMember, Way
+from configuration import (
+    HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_TIMEOUT_SECONDS,
+    OVERPASS_GEOMETRY_QUERY,
+    OVERPASS_TIMEOUT_SECONDS,
+    OVERPASS_URL,
+    cache,
+)
+from data.OSMElementStore import OSMElementStore
+from data.OSMElementStoreSource import OSMElementStoreSource
+from data.RequestScheduler import ErrorBudgetExceeded, RequestScheduler
+from network import getClient
+
+# Overpass runs one query per client at a time and answers 429 or 504
+# when busy, both of which are retried.
+overpassScheduler = RequestScheduler(
+    name="Overpass",
+    ratePerSecond=1.0,
+    burst=1,
+    maxRetries=HTTP_MAX_RETRIES,
+    backoffBaseSeconds=HTTP_BACKOFF_BASE_SECONDS,
+    backoffMaxSeconds=HTTP_BACKOFF_MAX_SECONDS,
+    errorBudget=0,
+)
+# Raised by unreachable or failing Overpass servers, overpy uses urllib.
+OVERPASS_ERRORS = (
+    overpy.exception.OverPyException,
+    OSError,
+    httpx.HTTPError,
+    ErrorBudgetExceeded,
+)
+
+
+def _overpyType(relationMember) -> str:
+    t = type(relationMember)
+    if t == overpy.RelationRelation:
+        return "relation"
+    if t == overpy.RelationWay:
+        return "way"
+    if t == overpy.RelationNode:
+        return "node"
+    raise NotImplementedError(f"Unsupported type: {t}")
 
 
-class OSMOverpass(OSMSource):
-    def __init__(self, mainRelationId: int) -> None:
-        super().__init__(mainRelationId)
-        self.overpassApi = overpy.Overpass(url=OVERPASS_URL)
-        self.overpassRelations = dict()
-        self.overpassWays = dict()
-        self.overpassNodes = dict()
+def _elementStoreFromResult(overpassResult: overpy.Result) -> OSMElementStore:
+    elementStore = OSMElementStore()
+    for node in overpassResult.nodes:
+        elementStore.addNode(node.id, float(node.lat), float(node.lon), node.tags)
+    for way in overpassResult.ways:
+        elementStore.addWay(way.id, [node.id for node in way.nodes], way.tags)
+    for relation in overpassResult.relations:
+        elementStore.addRelation(
+            relation.id,
+            [
+                (_overpyType(member), member.ref, member.role)
+                for member in relation.members
+            ],
+            relation.tags,
+        )
+    return elementStore
+
+
+def _elementStoreFromGeometryJson(elements: List[dict]) -> OSMElementStore:
+    # Member nodes come as full elements, other way nodes only as inline
+    # coordinates of "out geom" ways.
+    elementStore = OSMElementStore()
+    nodeIds = set()
+    ways: List[dict] = []
+    for element in elements:
+        if element["type"] == "node":
+            elementStore.addNode(
+                element["id"], element["lat"], element["lon"], element.get("tags")
+            )
+            nodeIds.add(element["id"])
+        elif element["type"] == "way":
+            ways.append(element)
+        elif element["type"] == "relation":
+            elementStore.addRelation(
+                element["id"],
+                [
+                    (member["type"], member["ref"], member["role"])
+                    for member in element["members"]
+                ],
+                element.get("tags", dict()),
+            )
+    for way in ways:
+        for nodeId, point in zip(way["nodes"], way["geometry"]):
+            if nodeId not in nodeIds:
+                elementStore.addNode(nodeId, point["lat"], point["lon"], dict())
+                nodeIds.add(nodeId)
+        elementStore.addWay(way["id"], way["nodes"], way.get("tags", dict()))
+    return elementStore
+
+
+def _queryOverpassJson(overpassUrl: str, query: str) -> Dict:
+    def request() -> Dict:
+        # The server may take up to its query timeout before answering.
+        response = getClient(overpassUrl).post(
+            overpassUrl,
+            data=dict(data=query),
+            timeout=OVERPASS_TIMEOUT_SECONDS + HTTP_TIMEOUT_SECONDS,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    return overpassScheduler.run(request)
 
+
+class OSMOverpass(OSMElementStoreSource):
+    # Static, so that the cache key is the query, not the source instance.
+    @staticmethod
     @cache.memoize()
-    def _getRelationDataFromOverpass(self, relationId: int):
+    def _getRelationElementStore(
+        relationId: int, overpassUrl: Optional[str]
+    ) -> OSMElementStore:
         query = f"""
-        [out:json][timeout:250];
+        [out:json][timeout:{OVERPASS_TIMEOUT_SECONDS}];
         relation(id:{relationId});
         (._;>>;);
         out body;
         """
-        return self.overpassApi.query(query)
-
-    def _saveRelationDataFromOverpass(self):
-        overpassResult = self._getRelationDataFromOverpass(self.mainRelationId)
-        for relation in overpassResult.relations:
-            self.overpassRelations[relation.id] = relation
-        for way in overpassResult.ways:
-            self.overpassWays[way.id] = way
-        for node in overpassResult.nodes:
-            self.overpassNodes[node.id] = node
-
-    def fetchNode(self, nodeId: int) -> Node:
-        node = self.overpassNodes[nodeId]
-
-        return Node(
-            type="node",
-            id=node.id,
-            lat=node.lat,
-            lon=node.lon,
-            tags=node.tags,
-        )
-
-    def fetchWay(self, wayId: int) -> Way:
-        way = self.overpassWays[wayId]
+        overpassResult = overpy.Overpass(url=overpassUrl).query(query)
+        return _elementStoreFromResult(overpassResult)
 
-        return Way(
-            id=way.id,
-            type="way",
-            tags=way.tags,
-            nodes=[self.fetchNode(node.id) for node in way.nodes],
+    @staticmethod
+    @cache.memoize()
+    def _getRelationGeometryElementStore(
+        relationId: int, overpassUrl: Optional[str]
+    ) -> OSMElementStore:
+        # Relations and their member nodes in full,
+        # ways with inline coordinates instead of every way node.
+        query = f"""
+        [out:json][timeout:{OVERPASS_TIMEOUT_SECONDS}];
+        relation(id:{relationId});
+        (._;>>;);
+        rel._->.relations;
+        .relations out body;
+        way(r.relations);
+        out geom;
+        node(r.relations);
+        out body;
+        """
+        overpassJson = _queryOverpassJson(
+            overpassUrl or overpy.Overpass.default_url, query
         )
+        return _elementStoreFromGeometryJson(overpassJson["elements"])
 
-    def fetchRelation(self, relationId: int) -> Relation:
-        relation = self.overpassRelations[relationId]
-
-        def overpyType(relationMember) -> str:
-            t = type(relationMember)
-            if t == overpy.RelationRelation:
-                return "relation"
-            if t == overpy.RelationWay:
-                return "way"
-            if t == overpy.RelationNode:
-                return "node"
-            raise NotImplementedError(f"Unsupported type: {t}")
-
-        return Relation(
-            id=relation.id,
-            type="relation",
-            tags=relation.tags,
-            members=[
-                RelationMember(
-                    ref=member.ref,
-                    type=overpyType(member),
-                    role=member.role,
-                    element=self.fetchElement(
-                        elementType=overpyType(member), elementId=member.ref
-                    ),
-                )
-                for member in relation.members
-            ],
-        )
+    def snapshotInputs(self) -> Tuple:
+        return super().snapshotInputs() + (OVERPASS_URL, OVERPASS_GEOMETRY_QUERY)
 
-    def savePublicTransportRelation(self):
-        self._saveRelationDataFromOverpass()
-        super().savePublicTransportRelation()
+    def loadElementStore(self) -> OSMElementStore:
+        if OVERPASS_GEOMETRY_QUERY:
+            return self._getRelationGeometryElementStore(
+                self.mainRelationId, OVERPASS_URL
+            )
+        return self._getRelationElementStore(self.mainRelationId, OVERPASS_URL)
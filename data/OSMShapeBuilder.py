@@ -0,0 +1,147 @@
+import hashlib
+from array import array
+from typing import Dict, List, Optional, Sequence, Set
+
+from configuration import CACHE_EXPIRE_SNAPSHOT, cache
+from data.OSMSource import Node, Way
+from data.TransportData import LatLon, PackedLatLons
+from log import printWarning
+
+# Bump whenever stitching changes, so that cached shapes are rebuilt.
+SHAPE_BUILDER_VERSION = 2
+
+
+def _isClosed(way: Way) -> bool:
+    return len(way.nodes) > 2 and way.nodes[0].id == way.nodes[-1].id
+
+
+def _distance(a: Node, b: Node) -> float:
+    # Only compared with each other, good enough for choosing the nearer end.
+    return (a.lat - b.lat) ** 2 + (a.lon - b.lon) ** 2
+
+
+class WayStitcher:
+    # Joins the ways of a route into one line: ways are oriented to continue
+    # from the current end, roundabouts are left at the node where the next way
+    # starts and shared junction nodes are kept once.
+    def __init__(self, ways: Sequence[Way]):
+        self.ways = ways
+        self.used = [False] * len(ways)
+        # node id -> ways which can continue from it, all nodes for roundabouts
+        self.endpoints: Dict[int, List[int]] = dict()
+        for index, way in enumerate(ways):
+            if not way.nodes:
+                self.used[index] = True
+                continue
+            nodes = way.nodes[:-1] if _isClosed(way) else [way.nodes[0], way.nodes[-1]]
+            for nodeId in {node.id for node in nodes}:
+                self.endpoints.setdefault(nodeId, []).append(index)
+        self.nodes: List[Node] = []
+        self.gaps = 0
+
+    def _touching(self, nodeId: int) -> List[int]:
+        return [
+            index for index in self.endpoints.get(nodeId, []) if not self.used[index]
+        ]
+
+    def _nextWay(self, previous: int) -> Optional[int]:
+        if self.nodes:
+            endId = self.nodes[-1].id
+            following = previous + 1
+            # Member order first, any connected way when members are out of order.
+            if following < len(self.ways) and following in self._touching(endId):
+                return following
+            if touching := self._touching(endId):
+                return touching[0]
+        return next((index for index, used in enumerate(self.used) if not used), None)
+
+    def _append(self, nodes: Sequence[Node]):
+        for node in nodes:
+            if not self.nodes or self.nodes[-1].id != node.id:
+                self.nodes.append(node)
+
+    def _appendOpenWay(self, index: int):
+        nodes = self.ways[index].nodes
+        if not self.nodes:
+            # Oriented towards the following member.
+            following = self.ways[index + 1] if index + 1 < len(self.ways) else None
+            followingIds = {node.id for node in following.nodes} if following else set()
+            if nodes[0].id in followingIds and nodes[-1].id not in followingIds:
+                nodes = nodes[::-1]
+        elif nodes[-1].id == self.nodes[-1].id:
+            nodes = nodes[::-1]
+        elif nodes[0].id != self.nodes[-1].id:
+            self.gaps += 1
+            if _distance(nodes[-1], self.nodes[-1]) < _distance(
+                nodes[0], self.nodes[-1]
+            ):
+                nodes = nodes[::-1]
+        self._append(nodes)
+
+    def _isRoundaboutExit(self, nodeId: int, exitIds: Set[int]) -> bool:
+        if exitIds:
+            return nodeId in exitIds
+        return bool(self._touching(nodeId))
+
+    def _appendRoundabout(self, index: int):
+        ring = self.ways[index].nodes[:-1]
+        ringIds = [node.id for node in ring]
+        if self.nodes and self.nodes[-1].id in ringIds:
+            start = ringIds.index(self.nodes[-1].id)
+        else:
+            if self.nodes:
+                self.gaps += 1
+                start = min(
+                    range(len(ring)),
+                    key=lambda position: _distance(ring[position], self.nodes[-1]),
+                )
+            else:
+                start = 0
+        # Roundabouts are one-way in the way direction, left where the following
+        # member starts, or at the first node where any other way continues.
+        following = index + 1
+        exitIds = {nodeId for nodeId in ringIds if following in self._touching(nodeId)}
+        self._append([ring[start]])
+        for step in range(1, len(ring) + 1):
+            node = ring[(start + step) % len(ring)]
+            self._append([node])
+            if self._isRoundaboutExit(node.id, exitIds):
+                break
+
+    def stitch(self) -> List[Node]:
+        index = -1
+        while (index := self._nextWay(index)) is not None:
+            self.used[index] = True
+            if _isClosed(self.ways[index]):
+                self._appendRoundabout(index)
+            else:
+                self._appendOpenWay(index)
+        return self.nodes
+
+
+def _fingerprint(ways: Sequence[Way]) -> str:
+    ids = array("q")
+    coordinates = array("d")
+    for way in ways:
+        ids.append(way.id)
+        for node in way.nodes:
+            ids.append(node.id)
+            coordinates.extend((node.lat, node.lon))
+        ids.append(-1)
+    contentHash = hashlib.sha256(ids.tobytes())
+    contentHash.update(coordinates.tobytes())
+    return contentHash.hexdigest()
+
+
+def routeGeometry(relationId: int, ways: Sequence[Way]) -> PackedLatLons:
+    key = ("osm-shape", SHAPE_BUILDER_VERSION, relationId, _fingerprint(ways))
+    if (result := cache.get(key)) is not None:
+        return result
+    stitcher = WayStitcher(ways)
+    result = PackedLatLons()
+    for node in stitcher.stitch():
+        result.append(LatLon(latitude=node.lat, longitude=node.lon))
+    if stitcher.gaps:
+        printWarning(f"Relation {relationId} has {stitcher.gaps} gaps between ways")
+    cache.set(key, result, expire=CACHE_EXPIRE_SNAPSHOT)
+    return result
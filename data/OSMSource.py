@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from log import printWarning
 
@@ -41,6 +41,14 @@ class OSMSource(ABC):
 
     def __init__(self, mainRelationId: int) -> None:
         self.mainRelationId = mainRelationId
+        # Elements shared by several parents are built once, keyed by (type, id).
+        self.elementRegistry: Dict[Tuple[str, int], Element] = dict()
+
+    @abstractmethod
+    def snapshotInputs(self) -> Tuple:
+        # What the fetched data depends on: a hash of the source content
+        # and the configuration which selects the source.
+        raise NotImplementedError
 
     @abstractmethod
     def fetchRelation(self, relationId: int) -> Relation:
@@ -55,17 +63,24 @@ class OSMSource(ABC):
         raise NotImplementedError
 
     def fetchElement(self, elementId: int, elementType: str) -> Element:
+        key = (elementType, elementId)
+        if (element := self.elementRegistry.get(key)) is not None:
+            return element
         if elementType == "relation":
-            return self.fetchRelation(elementId)
+            element = self.fetchRelation(elementId)
         elif elementType == "way":
-            return self.fetchWay(elementId)
+            element = self.fetchWay(elementId)
         elif elementType == "node":
-            return self.fetchNode(elementId)
+            element = self.fetchNode(elementId)
         else:
             raise NotImplementedError(f"unknown element type: {elementType}")
+        self.elementRegistry[key] = element
+        return element
 
     def savePublicTransportRelation(self):
-        self.mainRelation = self.fetchRelation(self.mainRelationId)
+        self.mainRelation = self.fetchElement(
+            elementId=self.mainRelationId, elementType="relation"
+        )
 
     def getRoutes(self) -> List[Relation]:
         return [
@@ -74,32 +89,28 @@ class OSMSource(ABC):
             if member.element.tags.get("route_master") == "bus"
         ]
 
-    def _getStops(self, element: Element) -> List[Element]:
+    def _getStops(self, root: Element) -> List[Element]:
         result = list()
         stopRefs = set()
-        if element.tags.get("highway") == "bus_stop":
-            if ref := element.tags.get("ref") is not None:
-                if ref not in stopRefs:
+        visited = {(root.type, root.id)}
+        stack = [root]
+        while stack:
+            element = stack.pop()
+            if element.tags.get("highway") == "bus_stop":
+                ref = element.tags.get("ref")
+                if ref is None:
+                    printWarning(f"Missing ref for {element}")
+                elif ref not in stopRefs:
                     result.append(element)
                     stopRefs.add(ref)
-            else:
-                printWarning(f"Missing ref for {element}")
-            result.append(element)
-        if type(element) == Relation:
-            for member in element.members:
-                memberStops = self._getStops(member.element)
-                for memberStop in memberStops:
-                    if ref := memberStop.tags.get("ref") is not None:
-                        if ref not in stopRefs:
-                            result.append(memberStop)
-                            stopRefs.add(ref)
-                    else:
-                        printWarning(f"Missing ref for {element}")
+            if isinstance(element, Relation):
+                # Reversed, so that members are visited in their order.
+                for member in reversed(element.members):
+                    key = (member.type, member.ref)
+                    if key not in visited:
+                        visited.add(key)
+                        stack.append(member.element)
         return result
 
     def getStops(self) -> Dict[str, Node]:
-        result = dict()
-        for stop in self._getStops(self.mainRelation):
-            ref = stop.tags["ref"]
-            result[ref] = stop
-        return result
+        return {stop.tags["ref"]: stop for stop in self._getStops(self.mainRelation)}
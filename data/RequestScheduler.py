@@ -0,0 +1,162 @@
+import asyncio
+import random
+import time
+from threading import Lock
+from typing import Awaitable, Callable, Iterable, List, TypeVar, Union
+
+import httpx
+
+from log import printError, printWarning
+
+T = TypeVar("T")
+
+
+class ErrorBudgetExceeded(Exception):
+    pass
+
+
+class RequestsFailed(Exception):
+    # Some requests failed within the error budget. The successful ones are
+    # cached, so a rerun only repeats the failed ones.
+    pass
+
+
+class TokenBucket:
+    def __init__(self, ratePerSecond: float, capacity: float):
+        self.ratePerSecond = ratePerSecond
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updatedAt = time.monotonic()
+        self.lock = Lock()
+
+    def reserve(self) -> float:
+        # Takes a token (possibly going into debt) and returns how long
+        # the caller has to wait before using it.
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updatedAt) * self.ratePerSecond,
+            )
+            self.updatedAt = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.ratePerSecond
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    async def acquireAsync(self):
+        await asyncio.sleep(self.reserve())
+
+
+def isRetryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        statusCode = error.response.status_code
+        return statusCode >= 500 or statusCode == httpx.codes.TOO_MANY_REQUESTS
+    return isinstance(error, httpx.TransportError)
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        name: str,
+        ratePerSecond: float,
+        burst: int,
+        maxRetries: int,
+        backoffBaseSeconds: float,
+        backoffMaxSeconds: float,
+        errorBudget: int,
+    ):
+        self.name = name
+        self.tokenBucket = TokenBucket(ratePerSecond=ratePerSecond, capacity=burst)
+        self.maxRetries = maxRetries
+        self.backoffBaseSeconds = backoffBaseSeconds
+        self.backoffMaxSeconds = backoffMaxSeconds
+        self.errorBudget = errorBudget
+        self.failures = 0
+        self.lock = Lock()
+
+    def _backoffSeconds(self, attempt: int) -> float:
+        # Exponential backoff with full jitter.
+        return random.uniform(
+            0, min(self.backoffMaxSeconds, self.backoffBaseSeconds * 2**attempt)
+        )
+
+    def _shouldRetry(self, error: Exception, attempt: int) -> bool:
+        if isRetryable(error) and attempt < self.maxRetries:
+            printWarning(f"{self.name}: retrying after {error!r}")
+            return True
+        with self.lock:
+            self.failures += 1
+            failures = self.failures
+        printError(
+            f"{self.name}: request failed ({failures}/{self.errorBudget}): {error!r}"
+        )
+        if failures > self.errorBudget:
+            raise ErrorBudgetExceeded(
+                f"{self.name}: more than {self.errorBudget} failed requests"
+            ) from error
+        return False
+
+    def _checkErrorBudget(self):
+        # Once the budget is spent, no new request is started.
+        with self.lock:
+            failures = self.failures
+        if failures > self.errorBudget:
+            raise ErrorBudgetExceeded(
+                f"{self.name}: more than {self.errorBudget} failed requests"
+            )
+
+    def run(self, request: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            self.tokenBucket.acquire()
+            self._checkErrorBudget()
+            try:
+                return request()
+            except Exception as error:
+                if not self._shouldRetry(error, attempt):
+                    raise
+            time.sleep(self._backoffSeconds(attempt))
+            attempt += 1
+
+    async def runAsync(self, request: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            await self.tokenBucket.acquireAsync()
+            self._checkErrorBudget()
+            try:
+                return await request()
+            except Exception as error:
+                if not self._shouldRetry(error, attempt):
+                    raise
+            await asyncio.sleep(self._backoffSeconds(attempt))
+            attempt += 1
+
+    async def gatherAsync(
+        self, requests: Iterable[Awaitable[T]]
+    ) -> List[Union[T, Exception]]:
+        # Like asyncio.gather with return_exceptions, failed requests are
+        # returned as their errors. Exceeding the error budget cancels
+        # the requests which have not finished yet and is raised.
+        async def settle(request: Awaitable[T]) -> Union[T, Exception]:
+            try:
+                return await request
+            except ErrorBudgetExceeded:
+                raise
+            except Exception as error:
+                return error
+
+        tasks = [asyncio.ensure_future(settle(request)) for request in requests]
+        if not tasks:
+            return []
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return [task.result() for task in tasks]
@@ -1,15 +1,88 @@
 from abc import ABC, abstractmethod
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from math import atan2, cos, radians, sin, sqrt
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, overload
 
+EARTH_RADIUS_METERS = 6373.0 * 1000  # same as starsep_utils.haversine
 
-@dataclass(eq=True)
+
+@dataclass(eq=True, frozen=True, slots=True)
 class LatLon:
     latitude: float
     longitude: float
 
-
-@dataclass
+    def distanceMeters(self, other: "LatLon") -> float:
+        # Haversine like starsep_utils.haversine, which truncates to whole
+        # meters and under-counts sums over short segments.
+        lat1, lon1 = radians(self.latitude), radians(self.longitude)
+        lat2, lon2 = radians(other.latitude), radians(other.longitude)
+        a = (
+            sin((lat2 - lat1) / 2) ** 2
+            + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_METERS * atan2(sqrt(a), sqrt(1 - a))
+
+
+class PackedLatLons(Sequence[LatLon]):
+    # Interleaved latitude/longitude buffer, LatLon objects are created on access.
+    __slots__ = ("coordinates",)
+
+    def __init__(self, points: Iterable[LatLon] = ()):
+        self.coordinates = array("d")
+        self.extend(points)
+
+    def append(self, point: LatLon):
+        self.coordinates.append(point.latitude)
+        self.coordinates.append(point.longitude)
+
+    def extend(self, points: Iterable[LatLon]):
+        if isinstance(points, PackedLatLons):
+            self.coordinates.extend(points.coordinates)
+            return
+        for point in points:
+            self.append(point)
+
+    def __len__(self) -> int:
+        return len(self.coordinates) // 2
+
+    @overload
+    def __getitem__(self, index: int) -> LatLon: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "PackedLatLons": ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PackedLatLons(self[i] for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return LatLon(
+            latitude=self.coordinates[2 * index],
+            longitude=self.coordinates[2 * index + 1],
+        )
+
+    def __iter__(self) -> Iterator[LatLon]:
+        coordinates = iter(self.coordinates)
+        for latitude, longitude in zip(coordinates, coordinates):
+            yield LatLon(latitude=latitude, longitude=longitude)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedLatLons):
+            return self.coordinates == other.coordinates
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(
+                point == otherPoint for point, otherPoint in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PackedLatLons({list(self)})"
+
+
+@dataclass(frozen=True)
 class BusStop(LatLon):
     id: str
     name: str
@@ -22,7 +95,8 @@ class RouteVariant:
     firstStopName: str
     lastStopName: str
     busStopsIds: List[int]
-    geometry: List[LatLon]
+    geometry: PackedLatLons
+    legLengths: List[float]  # meters between consecutive bus stops
 
 
 @dataclass
@@ -38,7 +112,7 @@ class Timetable:
     date: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class StopTime:
     minutes: int
     routeVariantId: str
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List
+from functools import cached_property
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple
 
 from geojson import Point
 
@@ -43,13 +45,21 @@ class GTFSRouteVariant:
     routeId: RouteId
     routeVariantId: RouteVariantId
     routeVariantName: str
-    shape: List[LatLon]
+    shape: Sequence[LatLon]
     busStopIds: List[StopId]
     shapeId: ShapeId
 
     def busStopNames(self, stops: Dict[StopId, GTFSStop]):
         return [stops[busStopId].stopName for busStopId in self.busStopIds]
 
+    @cached_property
+    def stopSequences(self) -> Dict[StopId, List[StopSequence]]:
+        # Loop variants visit some stops more than once.
+        result: Dict[StopId, List[StopSequence]] = dict()
+        for stopSequence, busStopId in enumerate(self.busStopIds):
+            result.setdefault(busStopId, []).append(stopSequence)
+        return result
+
 
 @dataclass
 class GTFSTrip(GTFSRouteVariant):
@@ -58,7 +68,7 @@ class GTFSTrip(GTFSRouteVariant):
     tripId: TripId
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class GTFSShape:
     shapeId: ShapeId
     shapeLat: float
@@ -80,16 +90,105 @@ class GTFSService:
     endDate: GTFSDate
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class GTFSStopTime:
     tripId: TripId
     minutes: int
-    arrivalTime: Time
-    departureTime: Time
     stopId: StopId
     stopSequence: StopSequence
 
 
+class GTFSStopTimes:
+    # Columnar stop_times: ids are stored once and referenced by integer codes,
+    # times stay in minutes until the feed is written.
+    def __init__(self):
+        self.tripIds: List[TripId] = []
+        self.tripCodes: Dict[TripId, int] = dict()
+        self.stopIds: List[StopId] = []
+        self.stopCodes: Dict[StopId, int] = dict()
+        self.tripColumn = array("i")
+        self.stopColumn = array("i")
+        self.stopSequenceColumn = array("i")
+        self.minutesColumn = array("i")
+
+    @staticmethod
+    def _code(ids: List[str], codes: Dict[str, int], elementId: str) -> int:
+        code = codes.get(elementId)
+        if code is None:
+            code = len(ids)
+            codes[elementId] = code
+            ids.append(elementId)
+        return code
+
+    def append(
+        self, tripId: TripId, stopId: StopId, stopSequence: StopSequence, minutes: int
+    ):
+        self.tripColumn.append(self._code(self.tripIds, self.tripCodes, tripId))
+        self.stopColumn.append(self._code(self.stopIds, self.stopCodes, stopId))
+        self.stopSequenceColumn.append(stopSequence)
+        self.minutesColumn.append(minutes)
+
+    def __len__(self) -> int:
+        return len(self.tripColumn)
+
+    def __getitem__(self, index: int) -> GTFSStopTime:
+        return GTFSStopTime(
+            tripId=self.tripIds[self.tripColumn[index]],
+            minutes=self.minutesColumn[index],
+            stopId=self.stopIds[self.stopColumn[index]],
+            stopSequence=self.stopSequenceColumn[index],
+        )
+
+    def __iter__(self) -> Iterator[GTFSStopTime]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def rows(self) -> Iterator[Tuple[TripId, StopId, StopSequence, int]]:
+        # Plain tuples, cheaper than records when writing the feed.
+        tripIds = self.tripIds
+        stopIds = self.stopIds
+        for tripCode, stopCode, stopSequence, minutes in zip(
+            self.tripColumn,
+            self.stopColumn,
+            self.stopSequenceColumn,
+            self.minutesColumn,
+        ):
+            yield tripIds[tripCode], stopIds[stopCode], stopSequence, minutes
+
+    def sortedRows(self) -> Iterator[Tuple[TripId, StopId, StopSequence, int]]:
+        tripIds = self.tripIds
+        order = sorted(
+            range(len(self)),
+            key=lambda index: (
+                tripIds[self.tripColumn[index]],
+                self.stopSequenceColumn[index],
+            ),
+        )
+        for index in order:
+            yield (
+                tripIds[self.tripColumn[index]],
+                self.stopIds[self.stopColumn[index]],
+                self.stopSequenceColumn[index],
+                self.minutesColumn[index],
+            )
+
+    def minutesAt(
+        self, keys: Iterable[Tuple[TripId, StopSequence]]
+    ) -> Dict[Tuple[TripId, StopSequence], int]:
+        codeKeys: Set[Tuple[int, StopSequence]] = {
+            (self.tripCodes[tripId], stopSequence)
+            for tripId, stopSequence in keys
+            if tripId in self.tripCodes
+        }
+        return {
+            (self.tripIds[tripCode], stopSequence): minutes
+            for tripCode, stopSequence, minutes in zip(
+                self.tripColumn, self.stopSequenceColumn, self.minutesColumn
+            )
+            if (tripCode, stopSequence) in codeKeys
+        }
+
+
 @dataclass
 class GTFSData:
     stops: Dict[StopId, GTFSStop]
@@ -98,7 +197,7 @@ class GTFSData:
     trips: Dict[TripId, GTFSTrip]
     shapes: List[GTFSShape]
     services: List[GTFSService]
-    stopTimes: List[GTFSStopTime]
+    stopTimes: GTFSStopTimes
 
 
 class GTFSConverter(ABC):
@@ -141,7 +240,7 @@ class GTFSConverter(ABC):
         routes: Dict[RouteId, GTFSRoute],
         routeVariants: Dict[RouteVariantId, GTFSRouteVariant],
         trips: Dict[TripId, GTFSTrip],
-    ) -> List[GTFSStopTime]:
+    ) -> GTFSStopTimes:
         raise NotImplementedError
 
     def data(self) -> GTFSData:
@@ -0,0 +1,99 @@
+import hashlib
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+from configuration import CACHE_EXPIRE_SNAPSHOT, cache
+from gtfs.GTFSConverter import GTFSData
+from log import printInfo, printWarning
+
+# Bump whenever GTFSData or the classes it holds change.
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PICKLE_PROTOCOL = 5
+STAGES = ("osm", "operator", "merge")
+SOURCE_ROOT = Path(__file__).resolve().parent.parent
+# Code and configuration which the stages are built with.
+SOURCE_PATTERNS = ["configuration.py", "data/*.py", "gtfs/*.py", "tczew/*.py"]
+
+
+@lru_cache(maxsize=None)
+def codeVersion() -> str:
+    contentHash = hashlib.sha256()
+    for pattern in SOURCE_PATTERNS:
+        for path in sorted(SOURCE_ROOT.glob(pattern)):
+            contentHash.update(path.relative_to(SOURCE_ROOT).as_posix().encode())
+            contentHash.update(path.read_bytes())
+    return contentHash.hexdigest()
+
+
+def snapshotKey(*inputs: Any) -> str:
+    # Inputs are plain values (ids, JSON, config), so repr is stable.
+    # Any change to the code or configuration invalidates every snapshot.
+    key = (SNAPSHOT_VERSION, codeVersion(), inputs)
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+class GTFSDataSnapshots:
+    def __init__(self, fromStage: Optional[str] = None):
+        # Stages before fromStage are taken from their latest snapshot,
+        # fromStage and later ones are always rebuilt.
+        self.fromStageIndex = STAGES.index(fromStage) if fromStage else None
+
+    @staticmethod
+    def _load(stage: str, key: str) -> Optional[GTFSData]:
+        data = cache.get(("snapshot", stage, key))
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    @staticmethod
+    def _save(stage: str, key: str, data: GTFSData, expire: float, tag: Optional[str]):
+        cache.set(
+            ("snapshot", stage, key),
+            pickle.dumps(data, protocol=SNAPSHOT_PICKLE_PROTOCOL),
+            expire=expire,
+            tag=tag,
+        )
+        cache.set(("snapshot-latest", stage), key)
+
+    def _loadLatest(self, stage: str) -> Optional[Tuple[str, GTFSData]]:
+        key = cache.get(("snapshot-latest", stage))
+        data = self._load(stage, key) if key is not None else None
+        if data is None:
+            printWarning(f"No {stage} snapshot, rebuilding it")
+            return None
+        return key, data
+
+    def stage(
+        self,
+        stage: str,
+        key: Callable[[], str],
+        build: Callable[[], GTFSData],
+        expire: float = CACHE_EXPIRE_SNAPSHOT,
+        tag: Optional[str] = None,
+    ) -> Tuple[str, GTFSData]:
+        # A tag evicts snapshots together with the cached responses they were
+        # built from. expire counts from saving the snapshot, not from fetching
+        # the responses, so it only bounds how long unused snapshots are kept.
+        # Builds which skip failed requests raise instead of returning partial
+        # data, so nothing partial is saved.
+        stageIndex = STAGES.index(stage)
+        rebuild = False
+        if self.fromStageIndex is not None:
+            if stageIndex < self.fromStageIndex:
+                latest = self._loadLatest(stage)
+                if latest is not None:
+                    printInfo(f"Using latest {stage} snapshot {latest[0][:12]}")
+                    return latest
+            rebuild = stageIndex >= self.fromStageIndex
+        stageKey = key()
+        if not rebuild:
+            data = self._load(stage, stageKey)
+            if data is not None:
+                printInfo(f"Using {stage} snapshot {stageKey[:12]}")
+                cache.set(("snapshot-latest", stage), stageKey)
+                return stageKey, data
+        data = build()
+        self._save(stage, stageKey, data, expire=expire, tag=tag)
+        return stageKey, data
@@ -0,0 +1,96 @@
+#!/usr/bin/env -S uv run python
+import argparse
+import csv
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from io import TextIOWrapper
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from zipfile import ZipFile
+
+Record = Dict[str, str]
+Key = Tuple[str, ...]
+Table = Dict[Key, Record]
+
+PRIMARY_KEYS: Dict[str, Tuple[str, ...]] = {
+    "stops.txt": ("stop_id",),
+    "routes.txt": ("route_id",),
+    "trips.txt": ("trip_id",),
+    "stop_times.txt": ("trip_id", "stop_sequence"),
+}
+
+
+@dataclass
+class TableDiff:
+    added: List[Record] = field(default_factory=list)
+    removed: List[Record] = field(default_factory=list)
+    # key columns with {column: [old, new]} for every changed column
+    changed: List[Dict[str, Any]] = field(default_factory=list)
+
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def loadTable(zipFile: ZipFile, name: str, primaryKey: Tuple[str, ...]) -> Table:
+    if name not in zipFile.namelist():
+        return dict()
+    with zipFile.open(name) as file:
+        reader = csv.DictReader(TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+        return {tuple(row[column] for column in primaryKey): row for row in reader}
+
+
+def loadFeed(path: Path) -> Dict[str, Table]:
+    with ZipFile(path) as zipFile:
+        return {
+            name: loadTable(zipFile, name, primaryKey)
+            for name, primaryKey in PRIMARY_KEYS.items()
+        }
+
+
+def diffTables(primaryKey: Tuple[str, ...], old: Table, new: Table) -> TableDiff:
+    result = TableDiff()
+    for key, newRecord in new.items():
+        oldRecord = old.get(key)
+        if oldRecord is None:
+            result.added.append(newRecord)
+        elif oldRecord != newRecord:
+            changes = {
+                column: [oldRecord.get(column), newRecord.get(column)]
+                for column in oldRecord.keys() | newRecord.keys()
+                if oldRecord.get(column) != newRecord.get(column)
+            }
+            result.changed.append(
+                dict(
+                    key=dict(zip(primaryKey, key)),
+                    changes=dict(sorted(changes.items())),
+                )
+            )
+    result.removed = [record for key, record in old.items() if key not in new]
+    return result
+
+
+def diffFeeds(oldPath: Path, newPath: Path) -> Dict[str, TableDiff]:
+    oldFeed = loadFeed(oldPath)
+    newFeed = loadFeed(newPath)
+    return {
+        name: diffTables(primaryKey, oldFeed[name], newFeed[name])
+        for name, primaryKey in PRIMARY_KEYS.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two GTFS feeds")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    arguments = parser.parse_args()
+    diff = diffFeeds(arguments.old, arguments.new)
+    json.dump(
+        {name: asdict(tableDiff) for name, tableDiff in diff.items()},
+        sys.stdout,
+        ensure_ascii=False,
+        indent=2,
+    )
+    sys.stdout.write("\n")
+    # Like diff(1): 1 means the feeds differ.
+    sys.exit(0 if all(tableDiff.empty() for tableDiff in diff.values()) else 1)
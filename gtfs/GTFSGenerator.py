@@ -1,54 +1,198 @@
+import csv
+import hashlib
+import zlib
 from abc import ABC, abstractmethod
-from zipfile import ZipFile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from configuration import outputGTFS
+from configuration import GTFS_COMPRESSION_LEVEL, GTFS_ZIP_WORKERS, outputGTFS
+from gtfs.GTFSZipWriter import CompressedMember, GTFSZipWriter
+
+Row = Sequence[Any]
+Rows = Iterable[Row]  # header first
+CHUNK_SIZE = 1 << 16
+
+
+def compressMember(
+    name: str,
+    rows: Rows,
+    compressionLevel: int,
+    unhashedColumns: AbstractSet[str] = frozenset(),
+    output: Optional[Callable[[bytes], None]] = None,
+) -> CompressedMember:
+    # Raw DEFLATE stream, as stored in ZIP_DEFLATED members. It is passed
+    # to output chunk by chunk, or kept in the member without output.
+    compressor = zlib.compressobj(compressionLevel, zlib.DEFLATED, -15)
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    # The content hash skips unhashed columns, it is computed on a copy
+    # of the table without them.
+    hashBuffer = StringIO() if unhashedColumns else buffer
+    hashWriter = csv.writer(hashBuffer, lineterminator="\n")
+    hashedIndices: List[int] = []
+    chunks: List[bytes] = []
+    contentHash = hashlib.sha256()
+    crc = 0
+    fileSize = 0
+    compressSize = 0
+
+    def emit(data: bytes):
+        nonlocal compressSize
+        compressSize += len(data)
+        if output is None:
+            chunks.append(data)
+        else:
+            output(data)
+
+    def flush():
+        nonlocal crc, fileSize
+        data = buffer.getvalue().encode("utf-8")
+        if hashBuffer is not buffer:
+            contentHash.update(hashBuffer.getvalue().encode("utf-8"))
+            hashBuffer.seek(0)
+            hashBuffer.truncate()
+        else:
+            contentHash.update(data)
+        buffer.seek(0)
+        buffer.truncate()
+        crc = zlib.crc32(data, crc)
+        fileSize += len(data)
+        emit(compressor.compress(data))
+
+    for index, row in enumerate(rows):
+        writer.writerow(row)
+        if hashBuffer is not buffer:
+            if index == 0:
+                hashedIndices = [
+                    column
+                    for column, columnName in enumerate(row)
+                    if columnName not in unhashedColumns
+                ]
+            hashWriter.writerow([row[column] for column in hashedIndices])
+        if buffer.tell() >= CHUNK_SIZE:
+            flush()
+    flush()
+    emit(compressor.flush())
+    return CompressedMember(
+        name=name,
+        crc=crc,
+        fileSize=fileSize,
+        compressSize=compressSize,
+        sha256=contentHash.hexdigest(),
+        data=b"".join(chunks) if output is None else None,
+    )
 
 
 class GTFSGenerator(ABC):
     @abstractmethod
-    def agencyInfo(self) -> str:
+    def agencyRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def stopsString(self) -> str:
+    def stopsRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def routesString(self) -> str:
+    def routesRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def tripsString(self) -> str:
+    def tripsRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def shapesString(self) -> str:
+    def shapesRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def calendarString(self) -> str:
+    def calendarRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def attributionsString(self) -> str:
+    def attributionsRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def feedInfoString(self) -> str:
+    def feedInfoRows(self) -> Rows:
         raise NotImplementedError
 
     @abstractmethod
-    def stopTimesString(self) -> str:
+    def stopTimesRows(self) -> Rows:
         raise NotImplementedError
 
-    def generate(self):
-        with ZipFile(outputGTFS, "w") as zipOutput:
-            zipOutput.writestr("agency.txt", self.agencyInfo())
-            zipOutput.writestr("stops.txt", self.stopsString())
-            zipOutput.writestr("routes.txt", self.routesString())
-            zipOutput.writestr("trips.txt", self.tripsString())
-            zipOutput.writestr("shapes.txt", self.shapesString())
-            zipOutput.writestr("calendar.txt", self.calendarString())
-            zipOutput.writestr("attributions.txt", self.attributionsString())
-            zipOutput.writestr("feed_info.txt", self.feedInfoString())
-            zipOutput.writestr("stop_times.txt", self.stopTimesString())
+    def tables(self) -> List[Tuple[str, Callable[[], Rows]]]:
+        return [
+            ("agency.txt", self.agencyRows),
+            ("stops.txt", self.stopsRows),
+            ("routes.txt", self.routesRows),
+            ("trips.txt", self.tripsRows),
+            ("shapes.txt", self.shapesRows),
+            ("calendar.txt", self.calendarRows),
+            ("attributions.txt", self.attributionsRows),
+            ("feed_info.txt", self.feedInfoRows),
+            ("stop_times.txt", self.stopTimesRows),
+        ]
+
+    def volatileColumns(self) -> Dict[str, Set[str]]:
+        # Columns which change on every run without changing the schedule,
+        # left out of the content hash. Keyed by table name.
+        return dict()
+
+    @staticmethod
+    def contentHashPath(outputPath: Path) -> Path:
+        return outputPath.with_name(outputPath.name + ".sha256")
+
+    def generate(self, outputPath: Path = outputGTFS, workers: int = GTFS_ZIP_WORKERS):
+        volatileColumns = self.volatileColumns()
+
+        def compressTable(
+            table: Tuple[str, Callable[[], Rows]],
+            output: Optional[Callable[[bytes], None]] = None,
+        ) -> CompressedMember:
+            name, rows = table
+            return compressMember(
+                name,
+                rows(),
+                GTFS_COMPRESSION_LEVEL,
+                unhashedColumns=volatileColumns.get(name, frozenset()),
+                output=output,
+            )
+
+        # Members are written in table order in both modes,
+        # so the archive does not depend on the number of workers.
+        contentHash = hashlib.sha256()
+
+        def hashMember(member: CompressedMember):
+            contentHash.update(f"{member.name} {member.sha256}\n".encode())
+
+        with GTFSZipWriter(outputPath) as zipOutput:
+            if workers > 1:
+                # zlib releases the GIL while compressing. Pool results are
+                # buffered until their turn to be written.
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for member in executor.map(compressTable, self.tables()):
+                        zipOutput.write(member)
+                        hashMember(member)
+            else:
+                # Streamed into the archive, memory stays flat as tables grow.
+                for table in self.tables():
+                    hashMember(
+                        zipOutput.writeStreamed(
+                            table[0],
+                            lambda output, table=table: compressTable(table, output),
+                        )
+                    )
+        self.contentHashPath(outputPath).write_text(contentHash.hexdigest() + "\n")
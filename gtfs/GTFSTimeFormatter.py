@@ -0,0 +1,33 @@
+from datetime import date, datetime, time
+from typing import List
+
+from pytz.tzinfo import BaseTzInfo
+
+from gtfs.GTFSConverter import Time
+
+MINUTES_IN_DAY = 24 * 60
+
+
+class GTFSTimeFormatter:
+    def __init__(self, utcOffsetMinutes: int = 0, days: int = 2):
+        self.utcOffsetMinutes = utcOffsetMinutes
+        # GTFS times continue past 24:00:00 for trips after midnight.
+        self.table: List[Time] = []
+        self._extendTable(days * MINUTES_IN_DAY)
+
+    @staticmethod
+    def forServiceDate(timezone: BaseTzInfo, serviceDate: date) -> "GTFSTimeFormatter":
+        noon = timezone.localize(datetime.combine(serviceDate, time(hour=12)))
+        return GTFSTimeFormatter(
+            utcOffsetMinutes=int(noon.utcoffset().total_seconds()) // 60
+        )
+
+    def _extendTable(self, size: int):
+        for minutes in range(len(self.table), size):
+            self.table.append(f"{minutes // 60:02d}:{minutes % 60:02d}:00")
+
+    def format(self, utcMinutes: int) -> Time:
+        minutes = utcMinutes + self.utcOffsetMinutes
+        if minutes >= len(self.table):
+            self._extendTable(minutes + 1)
+        return self.table[minutes]
@@ -0,0 +1,126 @@
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+# Fixed entry timestamps keep the archive identical for identical content.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_VERSION = 20  # 2.0, DEFLATE
+ZIP_MADE_BY_UNIX = 3 << 8 | ZIP_VERSION  # so that external attributes are modes
+ZIP_DEFLATED = 8
+ZIP_MAX_SIZE = 0xFFFFFFFF  # larger archives need ZIP64
+ZIP_FILE_MODE = 0o100600
+LOCAL_FILE_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_DIRECTORY_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+
+
+@dataclass
+class CompressedMember:
+    name: str
+    crc: int
+    fileSize: int
+    compressSize: int
+    sha256: str  # of the uncompressed content, without unhashed columns
+    data: Optional[bytes] = None  # raw DEFLATE stream, unless it was streamed
+
+
+def _dosDateTime(dateTime: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = dateTime
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class GTFSZipWriter:
+    # Writes already deflated members, which zipfile.ZipFile has no public
+    # API for. Only what GTFS feeds need: no ZIP64, no comments, no extras.
+    def __init__(self, path: Path):
+        self.file = path.open("wb")
+        self.centralDirectory: List[bytes] = []
+        self.dosDate, self.dosTime = _dosDateTime(ZIP_DATE_TIME)
+
+    def _localHeader(self, member: CompressedMember) -> bytes:
+        name = member.name.encode("ascii")
+        return (
+            LOCAL_FILE_HEADER.pack(
+                0x04034B50,
+                ZIP_VERSION,
+                0,
+                ZIP_DEFLATED,
+                self.dosTime,
+                self.dosDate,
+                member.crc,
+                member.compressSize,
+                member.fileSize,
+                len(name),
+                0,
+            )
+            + name
+        )
+
+    def _addToCentralDirectory(self, member: CompressedMember, offset: int):
+        if max(offset, member.fileSize, member.compressSize) > ZIP_MAX_SIZE:
+            raise ValueError(f"{member.name} needs ZIP64, which is not supported")
+        name = member.name.encode("ascii")
+        self.centralDirectory.append(
+            CENTRAL_DIRECTORY_HEADER.pack(
+                0x02014B50,
+                ZIP_MADE_BY_UNIX,
+                ZIP_VERSION,
+                0,
+                ZIP_DEFLATED,
+                self.dosTime,
+                self.dosDate,
+                member.crc,
+                member.compressSize,
+                member.fileSize,
+                len(name),
+                0,
+                0,
+                0,
+                0,
+                ZIP_FILE_MODE << 16,
+                offset,
+            )
+            + name
+        )
+
+    def write(self, member: CompressedMember):
+        offset = self.file.tell()
+        self.file.write(self._localHeader(member))
+        self.file.write(member.data)
+        self._addToCentralDirectory(member, offset)
+
+    def writeStreamed(
+        self, name: str, compress: Callable[[Callable[[bytes], None]], CompressedMember]
+    ) -> CompressedMember:
+        # compress writes the DEFLATE stream through the given callable.
+        # Sizes and CRC are only known afterwards, so the local header is
+        # written with zeros first and then patched. Seeking back instead of
+        # a data descriptor keeps the archive identical to write().
+        offset = self.file.tell()
+        self.file.write(self._localHeader(CompressedMember(name, 0, 0, 0, "")))
+        member = compress(self.file.write)
+        end = self.file.tell()
+        self.file.seek(offset)
+        self.file.write(self._localHeader(member))
+        self.file.seek(end)
+        self._addToCentralDirectory(member, offset)
+        return member
+
+    def close(self):
+        start = self.file.tell()
+        for entry in self.centralDirectory:
+            self.file.write(entry)
+        entries = len(self.centralDirectory)
+        self.file.write(
+            END_OF_CENTRAL_DIRECTORY.pack(
+                0x06054B50, 0, 0, entries, entries, self.file.tell() - start, start, 0
+            )
+        )
+        self.file.close()
+
+    def __enter__(self) -> "GTFSZipWriter":
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
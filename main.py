@@ -1,13 +1,35 @@
 #!/usr/bin/env -S uv run python
+import argparse
+
 from data.GeoJSONSaver import GeoJSONSaver
+from gtfs.GTFSDataSnapshots import STAGES
+from network import closeClients
+from pipeline import Pipeline
 from tczew.TczewGTFSGenerator import GTFSTczew
 from starsep_utils import healthchecks
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--from-stage",
+        choices=STAGES,
+        help="rebuild this stage and the following ones, "
+        "reusing latest snapshots of the earlier ones",
+    )
+    arguments = parser.parse_args()
     healthchecks("/start")
-    gtfs = GTFSTczew()
-    gtfs.generate()
-    GeoJSONSaver().save(gtfs.operatorData)
-    # gtfs.showTrips()
+    try:
+        pipeline = Pipeline()
+        pipeline.add("gtfs", lambda: GTFSTczew(fromStage=arguments.from_stage))
+        pipeline.add("zip", lambda gtfs: gtfs.generate(), dependencies=["gtfs"])
+        pipeline.add(
+            "geojson",
+            lambda gtfs: GeoJSONSaver().save(gtfs.operatorData),
+            dependencies=["gtfs"],
+        )
+        gtfs = pipeline.run()["gtfs"]
+        # gtfs.showTrips()
+    finally:
+        closeClients()
     healthchecks()
@@ -0,0 +1,118 @@
+from threading import Lock
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from configuration import HTTP2, HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT_SECONDS, cache
+from log import printWarning
+
+_clients: Dict[str, httpx.Client] = dict()
+_clientsLock = Lock()
+VALIDATORS_CACHE_KEY = "http-validators"
+
+
+def _http2Available() -> bool:
+    if not HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        printWarning("HTTP2 enabled, but h2 package is missing. Using HTTP/1.1")
+        return False
+    return True
+
+
+def _limits(maxConnections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=maxConnections,
+        max_keepalive_connections=maxConnections,
+    )
+
+
+def getClient(url: str) -> httpx.Client:
+    parsedUrl = urlsplit(url)
+    host = f"{parsedUrl.scheme}://{parsedUrl.netloc}"
+    with _clientsLock:
+        if host not in _clients:
+            _clients[host] = httpx.Client(
+                limits=_limits(HTTP_MAX_CONNECTIONS),
+                timeout=HTTP_TIMEOUT_SECONDS,
+                http2=_http2Available(),
+            )
+        return _clients[host]
+
+
+def getAsyncClient(maxConnections: Optional[int] = None) -> httpx.AsyncClient:
+    # Async clients are bound to the event loop they were used in,
+    # so they are created per asyncio.run and closed by the caller.
+    return httpx.AsyncClient(
+        limits=_limits(maxConnections or HTTP_MAX_CONNECTIONS),
+        timeout=HTTP_TIMEOUT_SECONDS,
+        http2=_http2Available(),
+    )
+
+
+def _conditionalRequest(url: str) -> Tuple[Tuple[str, str], Optional[Tuple], Dict]:
+    # Conditional GET: servers which send ETag or Last-Modified can answer
+    # 304 Not Modified instead of sending the same body again.
+    validatorsKey = (VALIDATORS_CACHE_KEY, url)
+    validators = cache.get(validatorsKey, retry=True)
+    headers = dict()
+    if validators is not None:
+        etag, lastModified, _ = validators
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if lastModified is not None:
+            headers["If-Modified-Since"] = lastModified
+    return validatorsKey, validators, headers
+
+
+def _conditionalResponse(
+    response: httpx.Response,
+    validatorsKey: Tuple[str, str],
+    validators: Optional[Tuple],
+    expire: Optional[float],
+    tag: Optional[str],
+):
+    if response.status_code == httpx.codes.NOT_MODIFIED and validators is not None:
+        return validators[2]
+    response.raise_for_status()
+    result = response.json()
+    etag = response.headers.get("ETag")
+    lastModified = response.headers.get("Last-Modified")
+    if etag is not None or lastModified is not None:
+        # The body is kept for 304 answers, so the entry follows the expire
+        # and tag of the endpoint's own cache.
+        cache.set(
+            validatorsKey,
+            (etag, lastModified, result),
+            expire=expire,
+            tag=tag,
+            retry=True,
+        )
+    return result
+
+
+def getJson(url: str, expire: Optional[float], tag: Optional[str] = None):
+    validatorsKey, validators, headers = _conditionalRequest(url)
+    response = getClient(url).get(url, headers=headers)
+    return _conditionalResponse(response, validatorsKey, validators, expire, tag)
+
+
+async def getJsonAsync(
+    client: httpx.AsyncClient,
+    url: str,
+    expire: Optional[float],
+    tag: Optional[str] = None,
+):
+    validatorsKey, validators, headers = _conditionalRequest(url)
+    response = await client.get(url, headers=headers)
+    return _conditionalResponse(response, validatorsKey, validators, expire, tag)
+
+
+def closeClients():
+    with _clientsLock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
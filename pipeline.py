@@ -0,0 +1,46 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[..., Any]  # called with results of dependencies, in order
+    dependencies: Sequence[str]
+
+
+class Pipeline:
+    def __init__(self) -> None:
+        self.stages: Dict[str, Stage] = dict()
+
+    def add(self, name: str, run: Callable[..., Any], dependencies: Sequence[str] = ()):
+        for dependency in dependencies:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        self.stages[name] = Stage(name=name, run=run, dependencies=dependencies)
+
+    def run(self) -> Dict[str, Any]:
+        # Stages can only depend on ones added before them,
+        # so the graph has no cycles and every stage eventually becomes ready.
+        results: Dict[str, Any] = dict()
+        pending: List[Stage] = list(self.stages.values())
+        running: Dict[Future, Stage] = dict()
+        with ThreadPoolExecutor(max_workers=max(len(self.stages), 1)) as executor:
+            while pending or running:
+                for stage in [
+                    stage
+                    for stage in pending
+                    if all(dependency in results for dependency in stage.dependencies)
+                ]:
+                    pending.remove(stage)
+                    arguments = [
+                        results[dependency] for dependency in stage.dependencies
+                    ]
+                    running[executor.submit(stage.run, *arguments)] = stage
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    # Raises the first failure, running stages are awaited on exit.
+                    results[stage.name] = future.result()
+        return results
@@ -1,54 +1,125 @@
-import httpx
+from typing import Optional
 
-from configuration import cache
+from diskcache import ENOVAL
+
+from configuration import (
+    CACHE_EXPIRE_NEXT_DEPARTURES,
+    CACHE_EXPIRE_TIMETABLE,
+    CACHE_EXPIRE_TIMETABLE_INFORMATION,
+    HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS,
+    HTTP_MAX_RETRIES,
+    TCZEW_API_BURST,
+    TCZEW_API_ERROR_BUDGET,
+    TCZEW_API_RATE_PER_SECOND,
+    cache,
+)
+from data.RequestScheduler import RequestScheduler
+from log import printInfo
+from network import getJson
 
 DOMAIN = "http://rozklady.tczew.pl"
+# Responses which depend on the currently published timetable.
+TIMETABLE_CACHE_TAG = "tczew-timetable"
+LAST_TIMETABLE_INFORMATION_KEY = "tczew-last-timetable-information"
+
+# Shared by the sync and async API, kept outside of TczewBusesAPI instances
+# because memoize cache keys include self.
+tczewScheduler = RequestScheduler(
+    name=DOMAIN,
+    ratePerSecond=TCZEW_API_RATE_PER_SECOND,
+    burst=TCZEW_API_BURST,
+    maxRetries=HTTP_MAX_RETRIES,
+    backoffBaseSeconds=HTTP_BACKOFF_BASE_SECONDS,
+    backoffMaxSeconds=HTTP_BACKOFF_MAX_SECONDS,
+    errorBudget=TCZEW_API_ERROR_BUDGET,
+)
+
+
+def _getJson(
+    url: str,
+    expire: Optional[float] = CACHE_EXPIRE_TIMETABLE,
+    tag: Optional[str] = TIMETABLE_CACHE_TAG,
+):
+    return tczewScheduler.run(lambda: getJson(url, expire=expire, tag=tag))
 
 
 class TczewBusesAPI:
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getMapBusStops(self, timetableId: int):
         url = f"{DOMAIN}/Home/GetMapBusStopList?q=&ttId={timetableId}"
-        return httpx.get(url).json()
+        return _getJson(url)
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getRouteList(self, timetableId: int):
         url = f"{DOMAIN}/Home/GetRouteList?ttId={timetableId}"
-        return httpx.get(url).json()[0]
+        return _getJson(url)[0]
+
+    @staticmethod
+    def timetableInformationUrl() -> str:
+        return f"{DOMAIN}/Home/GetTimetableInformation"
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE_INFORMATION)
     def getTimetableInformation(self):
-        url = f"{DOMAIN}/Home/GetTimetableInformation"
-        return httpx.get(url).json()
+        return _getJson(
+            self.timetableInformationUrl(),
+            expire=CACHE_EXPIRE_TIMETABLE_INFORMATION,
+            tag=None,
+        )
 
-    @cache.memoize()
+    def refreshIfTimetableChanged(self) -> bool:
+        # Validators outlive the hourly cache, so the daily check
+        # is usually a 304 answer.
+        current = _getJson(
+            self.timetableInformationUrl(), expire=CACHE_EXPIRE_TIMETABLE, tag=None
+        )
+        previous = cache.get(LAST_TIMETABLE_INFORMATION_KEY, default=ENOVAL)
+        changed = previous is not ENOVAL and previous != current
+        if changed:
+            evicted = cache.evict(TIMETABLE_CACHE_TAG)
+            printInfo(f"Timetable information changed, evicted {evicted} responses")
+        cache.set(LAST_TIMETABLE_INFORMATION_KEY, current)
+        cache.set(
+            TczewBusesAPI.getTimetableInformation.__cache_key__(self),
+            current,
+            expire=CACHE_EXPIRE_TIMETABLE_INFORMATION,
+        )
+        return changed
+
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getTracks(self, routeId: int, timetableId: int, transits: int):
         url = f"{DOMAIN}/Home/GetTracks?routeId={routeId}&ttId={timetableId}&transits={transits}"
-        return httpx.get(url).json()
+        return _getJson(url)
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getBusStopDetails(self, timetableId: int, busStopId: int):
         url = (
             f"{DOMAIN}/Home/GetBusStopDetails?ttId={timetableId}&nBusStopId={busStopId}"
         )
-        return httpx.get(url).json()
+        return _getJson(url)
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getBusStopRouteList(self, timetableId: int, busStopId: int):
         url = f"{DOMAIN}/Home/GetBusStopRouteList?id={busStopId}&ttId={timetableId}"
-        return httpx.get(url).json()
+        return _getJson(url)
 
-    @cache.memoize()
+    @staticmethod
+    def busStopTimeTableUrl(timetableId: int, busStopId: int, routeId: int) -> str:
+        return f"{DOMAIN}/Home/GetBusStopTimeTable?busStopId={busStopId}&routeId={routeId}&ttId={timetableId}"
+
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getBusStopTimeTable(self, timetableId: int, busStopId: int, routeId: int):
-        url = f"{DOMAIN}/Home/GetBusStopTimeTable?busStopId={busStopId}&routeId={routeId}&ttId={timetableId}"
-        return httpx.get(url).json()
+        url = self.busStopTimeTableUrl(
+            timetableId=timetableId, busStopId=busStopId, routeId=routeId
+        )
+        return _getJson(url)
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG)
     def getRouteVariant(self, routeVariantId: int, timetableId: int):
         url = f"{DOMAIN}/Home/GetRouteVariant?id={routeVariantId}&ttId={timetableId}"
-        return httpx.get(url).json()
+        return _getJson(url)
 
-    @cache.memoize()
+    @cache.memoize(expire=CACHE_EXPIRE_NEXT_DEPARTURES)
     def getNextDepartures(self, busStopId: int):
         url = f"{DOMAIN}/Home/GetNextDepartues?busStopId={busStopId}"
-        return httpx.get(url).json()
+        return _getJson(url, expire=CACHE_EXPIRE_NEXT_DEPARTURES, tag=None)
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Dict, List, Tuple
+
+import httpx
+from diskcache import ENOVAL
+
+from configuration import CACHE_EXPIRE_TIMETABLE, TCZEW_API_MAX_CONCURRENCY, cache
+from network import getAsyncClient, getJsonAsync
+from data.RequestScheduler import RequestsFailed
+from log import printError
+from tczew.TczewApi import TIMETABLE_CACHE_TAG, TczewBusesAPI, tczewScheduler
+
+BusStopTimeTableRequest = Tuple[int, int, int]  # (timetableId, busStopId, routeId)
+
+
+class TczewBusesAsyncAPI:
+    def __init__(
+        self,
+        tczewBusesApi: TczewBusesAPI,
+        maxConcurrency: int = TCZEW_API_MAX_CONCURRENCY,
+    ):
+        # Cache keys include the memoized method's self, so they have to be
+        # computed with the synchronous API instance.
+        self.tczewBusesApi = tczewBusesApi
+        self.maxConcurrency = maxConcurrency
+
+    def _busStopTimeTableCacheKey(self, request: BusStopTimeTableRequest):
+        timetableId, busStopId, routeId = request
+        return TczewBusesAPI.getBusStopTimeTable.__cache_key__(
+            self.tczewBusesApi,
+            timetableId=timetableId,
+            busStopId=busStopId,
+            routeId=routeId,
+        )
+
+    async def _fetchBusStopTimeTable(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        request: BusStopTimeTableRequest,
+    ):
+        timetableId, busStopId, routeId = request
+        url = TczewBusesAPI.busStopTimeTableUrl(
+            timetableId=timetableId, busStopId=busStopId, routeId=routeId
+        )
+
+        async def get():
+            async with semaphore:
+                return await getJsonAsync(
+                    client, url, expire=CACHE_EXPIRE_TIMETABLE, tag=TIMETABLE_CACHE_TAG
+                )
+
+        result = await tczewScheduler.runAsync(get)
+        cache.set(
+            self._busStopTimeTableCacheKey(request),
+            result,
+            expire=CACHE_EXPIRE_TIMETABLE,
+            tag=TIMETABLE_CACHE_TAG,
+            retry=True,
+        )
+        return result
+
+    async def _getBusStopTimeTables(
+        self, requests: List[BusStopTimeTableRequest]
+    ) -> Dict[BusStopTimeTableRequest, Any]:
+        result = dict()
+        missing = []
+        for request in requests:
+            cached = cache.get(
+                self._busStopTimeTableCacheKey(request), default=ENOVAL, retry=True
+            )
+            if cached is ENOVAL:
+                missing.append(request)
+            else:
+                result[request] = cached
+        if len(missing) == 0:
+            return result
+        semaphore = asyncio.Semaphore(self.maxConcurrency)
+        async with getAsyncClient(self.maxConcurrency) as client:
+            # Successful responses are already in the cache, so a rerun after
+            # a failure continues with the remaining requests.
+            timetables = await tczewScheduler.gatherAsync(
+                self._fetchBusStopTimeTable(client, semaphore, request)
+                for request in missing
+            )
+        failed = 0
+        for request, timetable in zip(missing, timetables):
+            if isinstance(timetable, Exception):
+                printError(f"Failed bus stop timetable {request}: {timetable!r}")
+                failed += 1
+                continue
+            result[request] = timetable
+        if failed > 0:
+            # An incomplete feed must not be published.
+            raise RequestsFailed(f"{failed} bus stop timetables failed, rerun to retry")
+        return result
+
+    def getBusStopTimeTables(
+        self, requests: List[BusStopTimeTableRequest]
+    ) -> Dict[BusStopTimeTableRequest, Any]:
+        return asyncio.run(self._getBusStopTimeTables(requests))
@@ -1,6 +1,6 @@
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 
-from configuration import feedVersion, startTimeUTC
+from configuration import feedVersion
 from gtfs.GTFSConverter import (
     GTFSConverter,
     GTFSRoute,
@@ -8,26 +8,33 @@ from gtfs.GTFSConverter import (
     GTFSService,
     GTFSShape,
     GTFSStop,
-    GTFSStopTime,
+    GTFSStopTimes,
     GTFSTrip,
     RouteId,
     RouteVariantId,
+    ServiceId,
     StopId,
     TripId,
     shapesFromRouteVariants,
     StopSequence,
 )
-from log import printError
+from log import printError, printInfo
 from tczew.TczewTransportData import TczewTransportData
 from data.TransportData import StopTime
 
 DAY_TYPE_TO_SERVICE = dict(PW="WD", SB="SA", ND="SU")
+DEFAULT_BUS_SPEED_METERS_PER_MINUTE = 20 * 1000 / 60
 
 
 class TczewGTFSConverter(GTFSConverter):
     def __init__(self, tczewTransportData: TczewTransportData):
         self.tczewTransportData = tczewTransportData
         self.tczewRoutes = self.tczewTransportData.getRoutes()
+        self.variantLegLengths: Dict[RouteVariantId, List[float]] = {
+            str(variant.id): variant.legLengths
+            for route in self.tczewRoutes
+            for variant in route.variants
+        }
 
     def stops(self) -> Dict[StopId, GTFSStop]:
         return {
@@ -68,28 +75,46 @@ class TczewGTFSConverter(GTFSConverter):
         services: List[GTFSService],
         routeVariants: Dict[RouteVariantId, GTFSRouteVariant],
     ) -> Dict[TripId, GTFSTrip]:
-        result = dict()
-        for variantId, routeVariant in routeVariants.items():
-            startBusStopId = routeVariant.busStopIds[0]
-            busStopRouteId = [(int(startBusStopId), int(routeVariant.routeId))]
-            for stopTimes in self.tczewTransportData.stopTimes(busStopRouteId):
-                for dayType, times in stopTimes.dayTypeToTimes.items():
-                    serviceId = DAY_TYPE_TO_SERVICE[dayType]
-                    for time in times:
-                        if str(time.routeVariantId) == routeVariant.routeVariantId:
-                            tripStartTime = time.minutes
-                            tripId = time.tripId
-                            result[tripId] = GTFSTrip(
-                                tripId=time.tripId,
-                                routeId=routeVariant.routeId,
-                                routeVariantId=routeVariant.routeVariantId,
-                                shape=routeVariant.shape,
-                                busStopIds=routeVariant.busStopIds,
-                                shapeId=routeVariant.shapeId,
-                                tripStartMinutes=tripStartTime,
-                                serviceId=serviceId,
-                                routeVariantName=routeVariant.routeVariantName,
-                            )
+        startBusStopRouteIds = list(
+            dict.fromkeys(
+                (int(routeVariant.busStopIds[0]), int(routeVariant.routeId))
+                for routeVariant in routeVariants.values()
+            )
+        )
+        timesIndex: Dict[
+            Tuple[StopId, RouteId, RouteVariantId], List[Tuple[ServiceId, StopTime]]
+        ] = dict()
+        for stopTimes in self.tczewTransportData.stopTimes(startBusStopRouteIds):
+            stopId = str(stopTimes.stopId)
+            routeId = str(stopTimes.routeId)
+            for dayType, times in stopTimes.dayTypeToTimes.items():
+                serviceId = DAY_TYPE_TO_SERVICE[dayType]
+                for time in times:
+                    key = (stopId, routeId, str(time.routeVariantId))
+                    timesIndex.setdefault(key, []).append((serviceId, time))
+        result: Dict[TripId, GTFSTrip] = dict()
+        for routeVariant in routeVariants.values():
+            key = (
+                routeVariant.busStopIds[0],
+                routeVariant.routeId,
+                routeVariant.routeVariantId,
+            )
+            for serviceId, time in timesIndex.get(key, []):
+                trip = result.get(time.tripId)
+                # Loop variants pass their first stop again, keep the departure.
+                if trip is not None and trip.tripStartMinutes <= time.minutes:
+                    continue
+                result[time.tripId] = GTFSTrip(
+                    tripId=time.tripId,
+                    routeId=routeVariant.routeId,
+                    routeVariantId=routeVariant.routeVariantId,
+                    shape=routeVariant.shape,
+                    busStopIds=routeVariant.busStopIds,
+                    shapeId=routeVariant.shapeId,
+                    tripStartMinutes=time.minutes,
+                    serviceId=serviceId,
+                    routeVariantName=routeVariant.routeVariantName,
+                )
         return result
 
     def shapes(
@@ -142,16 +167,6 @@ class TczewGTFSConverter(GTFSConverter):
             # TODO: handle multiple timetables
         ]
 
-    @staticmethod
-    def parseMinutesTimezone(minutes: int) -> str:
-        hour, minute = minutes // 60, minutes % 60
-        return (
-            startTimeUTC.replace(hour=hour + 2, minute=minute, second=0)
-            # TODO: fix timezone issue? currently constant +2 hours
-            # .astimezone(timezone)
-            .strftime("%H:%M:%S")
-        )
-
     @staticmethod
     def _busStopRouteIds(
         routes: Dict[RouteId, GTFSRoute],
@@ -178,87 +193,105 @@ class TczewGTFSConverter(GTFSConverter):
             timesGroupedByVariant[time.routeVariantId].append(time)
         return timesGroupedByVariant
 
-    @staticmethod
-    def _oneBeforeLastStopTimes(
-        stopTimes: List[GTFSStopTime], trips: Dict[TripId, GTFSTrip]
-    ) -> List[GTFSStopTime]:
-        lookingFor: Set[Tuple[StopId, TripId, StopSequence]] = set()
-        for trip in trips.values():
-            oneBeforeLast = trip.busStopIds[-2]
-            lookingFor.add((oneBeforeLast, trip.tripId, len(trip.busStopIds) - 2))
-        result = []
-        for stopTime in stopTimes:
-            key = (stopTime.stopId, stopTime.tripId, stopTime.stopSequence)
-            if key in lookingFor:
-                result.append(stopTime)
-        return result
+    def _inferLastLegMinutes(
+        self, trip: GTFSTrip, stopTimeMinutes: Dict[Tuple[TripId, StopSequence], int]
+    ) -> Optional[int]:
+        # Drive the last leg with the average speed of the rest of the trip.
+        legLengths = self.variantLegLengths.get(trip.routeVariantId)
+        if legLengths is None or len(legLengths) != len(trip.busStopIds) - 1:
+            return None
+        lastSequence = len(trip.busStopIds) - 1
+        travelledMinutes = stopTimeMinutes[
+            (trip.tripId, lastSequence - 1)
+        ] - stopTimeMinutes.get((trip.tripId, 0), trip.tripStartMinutes)
+        travelledMeters = sum(legLengths[:-1])
+        speed = (
+            travelledMeters / travelledMinutes
+            if travelledMinutes > 0 and travelledMeters > 0
+            else DEFAULT_BUS_SPEED_METERS_PER_MINUTE
+        )
+        return max(1, round(legLengths[-1] / speed))
 
     def _addLastStopTimes(
-        self, stopTimes: List[GTFSStopTime], trips: Dict[TripId, GTFSTrip]
-    ) -> List[GTFSStopTime]:
+        self, stopTimes: GTFSStopTimes, trips: Dict[TripId, GTFSTrip]
+    ) -> GTFSStopTimes:
         lastLegTimes = self.tczewTransportData.lastLegTimes()
-        oneBeforeLastStopTimes = self._oneBeforeLastStopTimes(stopTimes, trips)
+        stopTimeMinutes = stopTimes.minutesAt(
+            (trip.tripId, stopSequence)
+            for trip in trips.values()
+            for stopSequence in (0, len(trip.busStopIds) - 2)
+        )
         missing: Set[Tuple[StopId, StopId]] = set()
         for trip in trips.values():
             prev = trip.busStopIds[-2]
             last = trip.busStopIds[-1]
             key = (prev, last)
-            if key not in lastLegTimes:
+            stopSequence = len(trip.busStopIds) - 1
+            if (trip.tripId, stopSequence - 1) not in stopTimeMinutes:
+                missing.add(key)
+                continue
+            lastLegMinutes = lastLegTimes.get(key)
+            if lastLegMinutes is None:
+                lastLegMinutes = self._inferLastLegMinutes(trip, stopTimeMinutes)
+            if lastLegMinutes is None:
                 missing.add(key)
                 continue
-            stopSequence = len(trip.busStopIds) - 1
-            prevStopTime = next(
-                filter(
-                    lambda stopTime: stopTime.stopId == prev
-                    and stopTime.tripId == trip.tripId
-                    and stopTime.stopSequence == stopSequence - 1,
-                    oneBeforeLastStopTimes,
-                )
-            )
-            prevMinutes = prevStopTime.minutes
-            lastLegMinutes = lastLegTimes[key]
-            parsedTime = self.parseMinutesTimezone(prevMinutes + lastLegMinutes)
             stopTimes.append(
-                GTFSStopTime(
-                    tripId=trip.tripId,
-                    minutes=prevMinutes + lastLegMinutes,
-                    arrivalTime=parsedTime,
-                    departureTime=parsedTime,
-                    stopId=last,
-                    stopSequence=len(trip.busStopIds) - 1,
-                )
+                tripId=trip.tripId,
+                stopId=last,
+                stopSequence=stopSequence,
+                minutes=stopTimeMinutes[(trip.tripId, stopSequence - 1)]
+                + lastLegMinutes,
             )
         if len(missing) > 0:
             printError(f"Missing last leg times for bus stops: {missing}")
         return stopTimes
 
+    @staticmethod
+    def _withStopSequences(
+        stopSequences: List[StopSequence], times: List[StopTime]
+    ) -> List[Tuple[StopSequence, StopTime]]:
+        if len(stopSequences) == 1:
+            return [(stopSequences[0], time) for time in times]
+        # Stop visited more than once: assign visits of each trip in time order.
+        tripTimes: Dict[TripId, List[StopTime]] = dict()
+        for time in times:
+            tripTimes.setdefault(time.tripId, []).append(time)
+        return [
+            (stopSequence, time)
+            for timesOfTrip in tripTimes.values()
+            for stopSequence, time in zip(
+                stopSequences, sorted(timesOfTrip, key=lambda time: time.minutes)
+            )
+        ]
+
     def stopTimes(
         self,
         routes: Dict[RouteId, GTFSRoute],
         routeVariants: Dict[RouteVariantId, GTFSRouteVariant],
         trips: Dict[TripId, GTFSTrip],
-    ) -> List[GTFSStopTime]:
+    ) -> GTFSStopTimes:
         busStopRouteIds = self._busStopRouteIds(routes, routeVariants)
-        result = []
+        result = GTFSStopTimes()
         for stopTimes in self.tczewTransportData.stopTimes(busStopRouteIds):
+            stopId = str(stopTimes.stopId)
             for dayType, times in stopTimes.dayTypeToTimes.items():
                 timesGroupedByVariant = self._groupTimesByVariant(times)
                 for routeVariantId, timesGroup in timesGroupedByVariant.items():
-                    for index, time in enumerate(timesGroup):
-                        parsedTime = self.parseMinutesTimezone(time.minutes)
-                        stopId = str(stopTimes.stopId)
-                        stopSequence = routeVariants[
-                            str(time.routeVariantId)
-                        ].busStopIds.index(stopId)
-                        tripId = time.tripId
+                    stopSequences = routeVariants[str(routeVariantId)].stopSequences[
+                        stopId
+                    ]
+                    for stopSequence, time in self._withStopSequences(
+                        stopSequences, timesGroup
+                    ):
                         result.append(
-                            GTFSStopTime(
-                                tripId=tripId,
-                                minutes=time.minutes,
-                                arrivalTime=parsedTime,
-                                departureTime=parsedTime,
-                                stopId=stopId,
-                                stopSequence=stopSequence,
-                            )
+                            tripId=time.tripId,
+                            stopId=stopId,
+                            stopSequence=stopSequence,
+                            minutes=time.minutes,
                         )
+        printInfo(
+            f"Parsed timetables: {self.tczewTransportData.parsedStopTimesHits} hits, "
+            f"{self.tczewTransportData.parsedStopTimesMisses} misses"
+        )
         return self._addLastStopTimes(result, trips)
@@ -1,58 +1,134 @@
-from io import StringIO
+from typing import Dict, Optional, Set
 
 from rich.table import Table
 
-from configuration import TIMEZONE, feedVersion
+from configuration import (
+    CACHE_EXPIRE_TIMETABLE,
+    OSM_API_FALLBACK,
+    OSM_EXTRACT_PATH,
+    TCZEW_REFRESH_ON_TIMETABLE_CHANGE,
+    TIMEZONE,
+    feedVersion,
+    startTime,
+    timezone,
+)
 from data.OSMConverter import OSMConverter
 from data.OSMOperatorMerger import OSMOperatorMerger
-from data.OSMOverpass import OSMOverpass
+from data.OSMApi import OSMApi
+from data.OSMFile import OSMFile
+from data.OSMOverpass import OVERPASS_ERRORS, OSMOverpass
+from tczew.TczewApi import TIMETABLE_CACHE_TAG
 from tczew.TczewGTFSConverter import TczewGTFSConverter
 from tczew.TczewTransportData import TczewTransportData
-from gtfs.GTFSGenerator import GTFSGenerator
-from log import console
+from gtfs.GTFSDataSnapshots import GTFSDataSnapshots, snapshotKey
+from gtfs.GTFSGenerator import GTFSGenerator, Rows
+from gtfs.GTFSTimeFormatter import GTFSTimeFormatter
+from log import console, printWarning
+from pipeline import Pipeline
+
+MAIN_RELATION_ID = 12625881
 
 
 class GTFSTczew(GTFSGenerator):
-    def __init__(self):
-        self.osmData = OSMConverter(OSMOverpass(mainRelationId=12625881)).data()
-        self.operatorData = TczewGTFSConverter(TczewTransportData()).data()
-        self.gtfsData = OSMOperatorMerger(
-            osmData=self.osmData, operatorData=self.operatorData
-        ).data()
-
-    def agencyInfo(self) -> str:
-        agencyResult = StringIO()
-        agencyResult.write("agency_name,agency_url,agency_timezone,agency_lang\n")
-        agencyResult.write(
-            f"Przewozy Autobusowe Gryf sp. z o.o. sp. k.,http://rozklady.tczew.pl/,{TIMEZONE},pl"
+    def __init__(self, fromStage: Optional[str] = None):
+        snapshots = GTFSDataSnapshots(fromStage=fromStage)
+        self.osmSource = (
+            OSMFile(mainRelationId=MAIN_RELATION_ID, path=OSM_EXTRACT_PATH)
+            if OSM_EXTRACT_PATH is not None
+            else OSMOverpass(mainRelationId=MAIN_RELATION_ID)
+        )
+        tczewTransportData = TczewTransportData()
+        pipeline = Pipeline()
+        # OSM and operator branches are independent until the merge.
+        pipeline.add(
+            "osm",
+            lambda: snapshots.stage(
+                "osm",
+                key=self._osmSnapshotKey,
+                build=lambda: OSMConverter(self.osmSource).data(),
+            ),
+        )
+        pipeline.add(
+            "operator",
+            lambda: snapshots.stage(
+                "operator",
+                key=lambda: self._operatorSnapshotKey(tczewTransportData),
+                build=lambda: TczewGTFSConverter(tczewTransportData).data(),
+                # Dropped together with the timetables when they change.
+                expire=CACHE_EXPIRE_TIMETABLE,
+                tag=TIMETABLE_CACHE_TAG,
+            ),
+        )
+        pipeline.add(
+            "merge",
+            lambda osm, operator: snapshots.stage(
+                "merge",
+                key=lambda: snapshotKey(osm[0], operator[0]),
+                build=lambda: OSMOperatorMerger(
+                    osmData=osm[1], operatorData=operator[1]
+                ).data(),
+            ),
+            dependencies=["osm", "operator"],
+        )
+        results = pipeline.run()
+        _, self.osmData = results["osm"]
+        _, self.operatorData = results["operator"]
+        _, self.gtfsData = results["merge"]
+        self.timeFormatter = GTFSTimeFormatter.forServiceDate(
+            timezone, startTime.date()
+        )
+
+    def _osmSnapshotKey(self) -> str:
+        # The key is computed before building, so the source which answered
+        # is also the one the stage is built from.
+        try:
+            inputs = self.osmSource.snapshotInputs()
+        except OVERPASS_ERRORS as e:
+            if not (OSM_API_FALLBACK and isinstance(self.osmSource, OSMOverpass)):
+                raise
+            printWarning(f"Overpass failed, using the OpenStreetMap API: {e}")
+            self.osmSource = OSMApi(mainRelationId=MAIN_RELATION_ID)
+            inputs = self.osmSource.snapshotInputs()
+        return snapshotKey(type(self.osmSource).__name__, MAIN_RELATION_ID, inputs)
+
+    @staticmethod
+    def _operatorSnapshotKey(tczewTransportData: TczewTransportData) -> str:
+        # Refreshing first, so that a changed timetable is not hidden
+        # behind cached GetTimetableInformation.
+        if TCZEW_REFRESH_ON_TIMETABLE_CHANGE:
+            tczewTransportData.refreshIfTimetableChanged()
+        return snapshotKey(tczewTransportData.tczewBusesApi.getTimetableInformation())
+
+    def volatileColumns(self) -> Dict[str, Set[str]]:
+        # Both are the generation date.
+        return {"calendar.txt": {"start_date"}, "feed_info.txt": {"feed_version"}}
+
+    def agencyRows(self) -> Rows:
+        yield "agency_name", "agency_url", "agency_timezone", "agency_lang"
+        yield (
+            "Przewozy Autobusowe Gryf sp. z o.o. sp. k.",
+            "http://rozklady.tczew.pl/",
+            TIMEZONE,
+            "pl",
         )
-        return agencyResult.getvalue()
-
-    def stopsString(self) -> str:
-        stopsResult = StringIO()
-        stopsResult.write("stop_id,stop_name,stop_lat,stop_lon\n")
-        for stop in self.gtfsData.stops.values():
-            stopsResult.write(
-                f"{stop.stopId},{stop.stopName},{stop.stopLat},{stop.stopLon}\n"
-            )
-        return stopsResult.getvalue()
 
-    def routesString(self) -> str:
-        routesResult = StringIO()
-        routesResult.write("route_id,route_short_name,route_type\n")
+    def stopsRows(self) -> Rows:
+        yield "stop_id", "stop_name", "stop_lat", "stop_lon"
+        for stop in sorted(self.gtfsData.stops.values(), key=lambda stop: stop.stopId):
+            yield stop.stopId, stop.stopName, stop.stopLat, stop.stopLon
+
+    def routesRows(self) -> Rows:
+        yield "route_id", "route_short_name", "route_type"
         routeType = 3  # Bus. Used for short- and long-distance bus routes.
-        for route in self.gtfsData.routes.values():
-            routesResult.write(f"{route.routeId},{route.routeName},{routeType}\n")
-        return routesResult.getvalue()
+        for route in sorted(
+            self.gtfsData.routes.values(), key=lambda route: route.routeId
+        ):
+            yield route.routeId, route.routeName, routeType
 
-    def tripsString(self) -> str:
-        tripsResult = StringIO()
-        tripsResult.write("route_id,service_id,trip_id,shape_id\n")
-        for trip in self.gtfsData.trips.values():
-            tripsResult.write(
-                f"{trip.routeId},{trip.serviceId},{trip.tripId},{trip.shapeId}\n"
-            )
-        return tripsResult.getvalue()
+    def tripsRows(self) -> Rows:
+        yield "route_id", "service_id", "trip_id", "shape_id"
+        for trip in sorted(self.gtfsData.trips.values(), key=lambda trip: trip.tripId):
+            yield trip.routeId, trip.serviceId, trip.tripId, trip.shapeId
 
     def showTrips(self):
         stopIdToName = {
@@ -75,65 +151,85 @@ class GTFSTczew(GTFSGenerator):
             console.print(" or ".join([f"ref={ref}" for ref in trip.busStopIds]))
             console.print(table)
 
-    def shapesString(self) -> str:
-        shapesResult = StringIO()
-        shapesResult.write("shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n")
-        for shape in self.gtfsData.shapes:
-            shapesResult.write(
-                f"{shape.shapeId},{shape.shapeLat},{shape.shapeLon},{shape.shapeSequence}\n"
-            )
-        return shapesResult.getvalue()
-
-    def calendarString(self) -> str:
-        calendarResult = StringIO()
-        calendarResult.write(
-            "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+    def shapesRows(self) -> Rows:
+        yield "shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"
+        for shape in sorted(
+            self.gtfsData.shapes,
+            key=lambda shape: (shape.shapeId, shape.shapeSequence),
+        ):
+            yield shape.shapeId, shape.shapeLat, shape.shapeLon, shape.shapeSequence
+
+    def calendarRows(self) -> Rows:
+        yield (
+            "service_id",
+            "monday",
+            "tuesday",
+            "wednesday",
+            "thursday",
+            "friday",
+            "saturday",
+            "sunday",
+            "start_date",
+            "end_date",
         )
         for service in self.gtfsData.services:
-            daysBinary = ",".join(
-                str(int(day))
-                for day in [
-                    service.monday,
-                    service.tuesday,
-                    service.wednesday,
-                    service.thursday,
-                    service.friday,
-                    service.saturday,
-                    service.sunday,
-                ]
-            )
-            calendarResult.write(
-                f"{service.serviceId},{daysBinary},{service.startDate},{service.endDate}\n"
+            days = [
+                service.monday,
+                service.tuesday,
+                service.wednesday,
+                service.thursday,
+                service.friday,
+                service.saturday,
+                service.sunday,
+            ]
+            yield (
+                service.serviceId,
+                *(int(day) for day in days),
+                service.startDate,
+                service.endDate,
             )
-        return calendarResult.getvalue()
 
-    def attributionsString(self) -> str:
-        result = StringIO()
-        result.write(
-            "organization_name,is_producer,is_operator,is_authority,attribution_url\n"
+    def attributionsRows(self) -> Rows:
+        yield (
+            "organization_name",
+            "is_producer",
+            "is_operator",
+            "is_authority",
+            "attribution_url",
         )
-        result.write(
-            '"Data from Tczew public transport website",0,0,1,"http://rozklady.tczew.pl/"\n'
+        yield (
+            "Data from Tczew public transport website",
+            0,
+            0,
+            1,
+            "http://rozklady.tczew.pl/",
         )
-        result.write(
-            '"Bus shapes based on data by: © OpenStreetMap contributors (ODbL license)"'
+        yield (
+            "Bus shapes based on data by: © OpenStreetMap contributors (ODbL license)",
+            0,
+            0,
+            1,
+            "https://www.openstreetmap.org/copyright/",
         )
-        result.write(',0,0,1,"https://www.openstreetmap.org/copyright/"\n')
-        return result.getvalue()
-
-    def feedInfoString(self) -> str:
-        result = StringIO()
-        result.write("feed_publisher_name,feed_publisher_url,feed_lang,feed_version\n")
-        result.write(f'"Filip Czaplicki","https://starsep.com/gtfs/",pl,{feedVersion}')
-        return result.getvalue()
-
-    def stopTimesString(self) -> str:
-        result = StringIO()
-        result.write(
-            "trip_id,arrival_time,departure_time,stop_id,stop_sequence,timepoint\n"
+
+    def feedInfoRows(self) -> Rows:
+        yield "feed_publisher_name", "feed_publisher_url", "feed_lang", "feed_version"
+        yield "Filip Czaplicki", "https://starsep.com/gtfs/", "pl", feedVersion
+
+    def stopTimesRows(self) -> Rows:
+        yield (
+            "trip_id",
+            "arrival_time",
+            "departure_time",
+            "stop_id",
+            "stop_sequence",
+            "timepoint",
         )
-        for stopTime in self.gtfsData.stopTimes:
-            result.write(
-                f"{stopTime.tripId},{stopTime.arrivalTime},{stopTime.departureTime},{stopTime.stopId},{stopTime.stopSequence},1\n"
-            )
-        return result.getvalue()
+        for (
+            tripId,
+            stopId,
+            stopSequence,
+            minutes,
+        ) in self.gtfsData.stopTimes.sortedRows():
+            time = self.timeFormatter.format(minutes)
+            yield tripId, time, time, stopId, stopSequence, 1
@@ -1,10 +1,13 @@
+import sys
 from typing import Dict, List, Tuple
 
 from gtfs.GTFSConverter import StopId
 from tczew.TczewApi import TczewBusesAPI
+from tczew.TczewAsyncApi import TczewBusesAsyncAPI
 from data.TransportData import (
     BusStop,
     LatLon,
+    PackedLatLons,
     Route,
     RouteVariant,
     StopTime,
@@ -18,6 +21,15 @@ class TczewTransportData(TransportData):
     def __init__(self) -> None:
         super().__init__()
         self.tczewBusesApi = TczewBusesAPI()
+        self.tczewBusesAsyncApi = TczewBusesAsyncAPI(self.tczewBusesApi)
+        # Parsed timetables for the duration of the run,
+        # keyed by (timetableId, busStopId, routeId).
+        self.parsedStopTimes: Dict[Tuple[int, int, int], StopTimes] = dict()
+        self.parsedStopTimesHits = 0
+        self.parsedStopTimesMisses = 0
+
+    def refreshIfTimetableChanged(self) -> bool:
+        return self.tczewBusesApi.refreshIfTimetableChanged()
 
     def getBusStops(self, timetableId: int = 0) -> Dict[int, BusStop]:
         stops = dict()
@@ -73,12 +85,13 @@ class TczewTransportData(TransportData):
         variants = []
         for variant in tracks[3]:
             variantRouteBusStopIds = variant[6][0]
-            variantGeometry = []
+            variantGeometry = PackedLatLons()
+            legLengths = []
             for stopPair in zip(
                 variantRouteBusStopIds[:-1], variantRouteBusStopIds[1:]
             ):
-                for point in legsGeometry[stopPair]:
-                    variantGeometry.append(point)
+                variantGeometry.extend(legsGeometry[stopPair])
+                legLengths.append(self._length(legsGeometry[stopPair]))
             variants.append(
                 RouteVariant(
                     id=variant[0],
@@ -90,52 +103,74 @@ class TczewTransportData(TransportData):
                         for routeBusStopId in variantRouteBusStopIds
                     ],
                     geometry=variantGeometry,
+                    legLengths=legLengths,
                 )
             )
         return variants
 
+    @staticmethod
+    def _length(points: List[LatLon]) -> float:
+        return sum(a.distanceMeters(b) for a, b in zip(points[:-1], points[1:]))
+
     @staticmethod
     def parseFirstMinutes(time: str) -> int:
         return int(time[:-2]) * 60 + int(time[-2:])
 
+    def _parseStopTimes(self, stopId: int, routeId: int, timetable) -> StopTimes:
+        dayTypeToTimes = dict()
+        for dayTypeTimes in timetable[3]:
+            dayType = dayTypeTimes[0]
+            dayTypeToTimes[dayType] = []
+            firstRaw = dict()
+            for x in dayTypeTimes[4]:
+                routeVariantId = x[0]
+                tripId = sys.intern(str(x[1]))
+                raw = x[2]
+                if routeVariantId not in firstRaw:
+                    firstRaw[routeVariantId] = raw
+                minutes = (
+                    self.parseFirstMinutes(firstRaw[routeVariantId])
+                    - int(firstRaw[routeVariantId])
+                    + int(raw)
+                )
+                dayTypeToTimes[dayType].append(
+                    StopTime(
+                        routeVariantId=routeVariantId,
+                        tripId=tripId,
+                        minutes=minutes,
+                    )
+                )
+        return StopTimes(stopId=stopId, routeId=routeId, dayTypeToTimes=dayTypeToTimes)
+
     def stopTimes(
         self, busStopIdRouteIds: List[Tuple[int, int]], timetableId: int = 0
     ) -> List[StopTimes]:
-        result = []
-        for stopId, routeId in busStopIdRouteIds:
-            timetable = self.tczewBusesApi.getBusStopTimeTable(
-                timetableId=timetableId, busStopId=stopId, routeId=routeId
-            )
-            dayTypeToTimes = dict()
-            for dayTypeTimes in timetable[3]:
-                dayType = dayTypeTimes[0]
-                dayTypeToTimes[dayType] = []
-                firstRaw = dict()
-                for x in dayTypeTimes[4]:
-                    routeVariantId = x[0]
-                    tripId = str(x[1])
-                    raw = x[2]
-                    if routeVariantId not in firstRaw:
-                        firstRaw[routeVariantId] = raw
-                    minutes = (
-                        self.parseFirstMinutes(firstRaw[routeVariantId])
-                        - int(firstRaw[routeVariantId])
-                        + int(raw)
-                    )
-                    dayTypeToTimes[dayType].append(
-                        StopTime(
-                            routeVariantId=routeVariantId,
-                            tripId=tripId,
-                            minutes=minutes,
-                        )
-                    )
-            result.append(
-                StopTimes(stopId=stopId, routeId=routeId, dayTypeToTimes=dayTypeToTimes)
-            )
-        return result
+        requests = [
+            (timetableId, stopId, routeId) for stopId, routeId in busStopIdRouteIds
+        ]
+        missing = [
+            request
+            for request in dict.fromkeys(requests)
+            if request not in self.parsedStopTimes
+        ]
+        self.parsedStopTimesMisses += len(missing)
+        self.parsedStopTimesHits += len(requests) - len(missing)
+        if len(missing) > 0:
+            timetables = self.tczewBusesAsyncApi.getBusStopTimeTables(missing)
+            for request, timetable in timetables.items():
+                _, stopId, routeId = request
+                self.parsedStopTimes[request] = self._parseStopTimes(
+                    stopId, routeId, timetable
+                )
+        return [
+            self.parsedStopTimes[request]
+            for request in requests
+            if request in self.parsedStopTimes
+        ]
 
     @staticmethod
     def lastLegTimes() -> Dict[Tuple[StopId, StopId], int]:
+        # Overrides for last legs inferred from the shape length.
         return {
             # Czyżykowska/Konarskiego -> Czyżykowo
             ("10134", "10024"): 1,
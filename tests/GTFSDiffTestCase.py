@@ -0,0 +1,55 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zipfile import ZipFile
+
+from gtfs.GTFSDiff import diffFeeds
+
+
+def writeFeed(path: Path, stops: str, stopTimes: str):
+    with ZipFile(path, "w") as zipFile:
+        zipFile.writestr("stops.txt", stops)
+        zipFile.writestr("stop_times.txt", stopTimes)
+
+
+class GTFSDiffTestCase(TestCase):
+    def test_diffFeeds(self):
+        with TemporaryDirectory() as directory:
+            oldPath = Path(directory) / "old.zip"
+            newPath = Path(directory) / "new.zip"
+            writeFeed(
+                oldPath,
+                "stop_id,stop_name\n1,Dworzec\n2,Rynek\n",
+                "trip_id,stop_sequence,stop_id\nA,0,1\nA,1,2\n",
+            )
+            writeFeed(
+                newPath,
+                "stop_id,stop_name\n1,Dworzec PKP\n3,Szpital\n",
+                "trip_id,stop_sequence,stop_id\nA,0,1\nA,1,3\n",
+            )
+            diff = diffFeeds(oldPath, newPath)
+        self.assertEqual(
+            diff["stops.txt"].added, [dict(stop_id="3", stop_name="Szpital")]
+        )
+        self.assertEqual(
+            diff["stops.txt"].removed, [dict(stop_id="2", stop_name="Rynek")]
+        )
+        self.assertEqual(
+            diff["stops.txt"].changed,
+            [
+                dict(
+                    key=dict(stop_id="1"),
+                    changes=dict(stop_name=["Dworzec", "Dworzec PKP"]),
+                )
+            ],
+        )
+        self.assertEqual(
+            diff["stop_times.txt"].changed,
+            [
+                dict(
+                    key=dict(trip_id="A", stop_sequence="1"),
+                    changes=dict(stop_id=["2", "3"]),
+                )
+            ],
+        )
+        self.assertTrue(diff["routes.txt"].empty())
@@ -0,0 +1,109 @@
+import random
+import tracemalloc
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zipfile import ZipFile
+
+from gtfs.GTFSGenerator import GTFSGenerator
+
+
+class ExampleGTFSGenerator(GTFSGenerator):
+    def agencyRows(self):
+        return [("agency_name",), ("Example",)]
+
+    def stopsRows(self):
+        yield "stop_id", "stop_name"
+        for stopId in range(1000):
+            yield stopId, f"Stop {stopId}, platform {stopId % 3}"
+
+    def routesRows(self):
+        return [("route_id",), ("1",)]
+
+    def tripsRows(self):
+        return [("trip_id",)]
+
+    def shapesRows(self):
+        yield "shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"
+        for sequence in range(50000):
+            yield "1", 54.0 + sequence / 1e5, 18.0, sequence
+
+    def calendarRows(self):
+        return [("service_id",)]
+
+    def attributionsRows(self):
+        return [("organization_name",)]
+
+    def feedInfoRows(self):
+        return [("feed_version",)]
+
+    def stopTimesRows(self):
+        return [("trip_id",)]
+
+
+class GTFSGeneratorTestCase(TestCase):
+    def test_parallelMatchesSerial(self):
+        generator = ExampleGTFSGenerator()
+        with TemporaryDirectory() as directory:
+            serialPath = Path(directory) / "serial.zip"
+            parallelPath = Path(directory) / "parallel.zip"
+            generator.generate(serialPath, workers=1)
+            generator.generate(parallelPath, workers=4)
+            self.assertEqual(serialPath.read_bytes(), parallelPath.read_bytes())
+            with ZipFile(serialPath) as zipFile:
+                self.assertIsNone(zipFile.testzip())
+                self.assertEqual(
+                    [name for name, _ in generator.tables()], zipFile.namelist()
+                )
+                stops = zipFile.read("stops.txt").decode().splitlines()
+                self.assertEqual(stops[1], '0,"Stop 0, platform 0"')
+
+    def test_contentHashIgnoresVolatileColumns(self):
+        class CalendarGTFSGenerator(ExampleGTFSGenerator):
+            def __init__(self, startDate: str, monday: int):
+                self.startDate = startDate
+                self.monday = monday
+
+            def volatileColumns(self):
+                return {"calendar.txt": {"start_date"}}
+
+            def calendarRows(self):
+                return [
+                    ("service_id", "monday", "start_date"),
+                    ("WD", self.monday, self.startDate),
+                ]
+
+        with TemporaryDirectory() as directory:
+            hashes = []
+            for startDate, monday in [
+                ("20260101", 1),
+                ("20260102", 1),
+                ("20260102", 0),
+            ]:
+                outputPath = Path(directory) / f"{startDate}-{monday}.zip"
+                CalendarGTFSGenerator(startDate, monday).generate(outputPath, workers=1)
+                hashes.append(GTFSGenerator.contentHashPath(outputPath).read_text())
+            self.assertEqual(hashes[0], hashes[1])
+            self.assertNotEqual(hashes[1], hashes[2])
+
+    def test_serialModeStreamsMembers(self):
+        class RandomShapesGTFSGenerator(ExampleGTFSGenerator):
+            def shapesRows(self):
+                # Random coordinates hardly compress.
+                generator = random.Random(1)
+                yield "shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"
+                for sequence in range(100000):
+                    yield "1", generator.random(), generator.random(), sequence
+
+        with TemporaryDirectory() as directory:
+            outputPath = Path(directory) / "gtfs.zip"
+            tracemalloc.start()
+            try:
+                RandomShapesGTFSGenerator().generate(outputPath, workers=1)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            with ZipFile(outputPath) as zipFile:
+                self.assertIsNone(zipFile.testzip())
+                shapesSize = zipFile.getinfo("shapes.txt").compress_size
+        self.assertLess(peak, shapesSize / 2)
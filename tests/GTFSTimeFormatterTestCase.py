@@ -0,0 +1,29 @@
+from datetime import date
+from unittest import TestCase
+
+from configuration import timezone
+from gtfs.GTFSTimeFormatter import GTFSTimeFormatter
+
+
+class GTFSTimeFormatterTestCase(TestCase):
+    def test_offsetForServiceDate(self):
+        for serviceDate, expected in [
+            (date(2025, 1, 15), 60),
+            (date(2025, 7, 15), 120),
+        ]:
+            self.assertEqual(
+                GTFSTimeFormatter.forServiceDate(
+                    timezone, serviceDate
+                ).utcOffsetMinutes,
+                expected,
+            )
+
+    def test_format(self):
+        formatter = GTFSTimeFormatter(utcOffsetMinutes=120)
+        for minutes, expected in [
+            (0, "02:00:00"),
+            (432, "09:12:00"),
+            (1430, "25:50:00"),
+            (3000, "52:00:00"),
+        ]:
+            self.assertEqual(formatter.format(minutes), expected)
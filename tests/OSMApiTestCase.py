@@ -0,0 +1,129 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from configuration import cache
+from data.OSMApi import OPENSTREETMAP_API, OSMApi
+from data.OSMSource import Node, Way
+
+MAIN_RELATION_ID = 1
+PLATFORM_TAGS = dict(highway="bus_stop", public_transport="platform", ref="1")
+NODES = {
+    10: dict(type="node", id=10, lat=54.090, lon=18.790, tags=PLATFORM_TAGS),
+    100: dict(type="node", id=100, lat=54.0901, lon=18.7901),
+    101: dict(type="node", id=101, lat=54.0925, lon=18.7950),
+    102: dict(type="node", id=102, lat=54.0940, lon=18.7990),
+    103: dict(type="node", id=103, lat=54.0959, lon=18.8021),
+    104: dict(type="node", id=104, lat=54.0970, lon=18.8040),
+}
+WAYS = {
+    20: dict(type="way", id=20, nodes=[100, 101], tags=dict(highway="primary")),
+    21: dict(type="way", id=21, nodes=[102, 103, 104], tags=dict()),
+}
+
+
+def relation(relationId: int, members: list, tags: dict) -> dict:
+    return dict(
+        type="relation",
+        id=relationId,
+        members=[
+            dict(type=memberType, ref=ref, role=role)
+            for memberType, ref, role in members
+        ],
+        tags=tags,
+    )
+
+
+RELATIONS = {
+    1: relation(1, [("relation", 2, "")], dict(type="network")),
+    2: relation(
+        2,
+        [("relation", 3, "")],
+        dict(type="route_master", route_master="bus", ref="7"),
+    ),
+    3: relation(
+        3,
+        [("node", 10, "platform"), ("way", 20, "")],
+        dict(type="route", route="bus", ref="7"),
+    ),
+}
+# full.json lists member relations without their members.
+RESPONSES = {
+    f"{OPENSTREETMAP_API}/relation/1/full.json": [RELATIONS[1], RELATIONS[2]],
+    f"{OPENSTREETMAP_API}/relation/2/full.json": [RELATIONS[2], RELATIONS[3]],
+    f"{OPENSTREETMAP_API}/relation/3/full.json": [
+        RELATIONS[3],
+        NODES[10],
+        WAYS[20],
+        NODES[100],
+        NODES[101],
+    ],
+    f"{OPENSTREETMAP_API}/ways.json?ways=21": [WAYS[21]],
+    f"{OPENSTREETMAP_API}/nodes.json?nodes=102,103": [NODES[102], NODES[103]],
+    f"{OPENSTREETMAP_API}/nodes.json?nodes=104": [NODES[104]],
+}
+
+
+class OSMApiTestCase(TestCase):
+    def setUp(self):
+        # Memoized responses of earlier runs would hide the requests.
+        for relationId in RELATIONS:
+            cache.delete(OSMApi._fetchRelationFull.__cache_key__(relationId))
+        for elementType, elementIds in [
+            ("way", (21,)),
+            ("node", (102, 103)),
+            ("node", (104,)),
+        ]:
+            cache.delete(OSMApi._fetchMultiple.__cache_key__(elementType, elementIds))
+        self.urls = []
+
+    def getJson(self, url: str, **kwargs) -> dict:
+        self.urls.append(url)
+        return dict(elements=RESPONSES[url])
+
+    def test_loadsRelationTreeWithFullRequests(self):
+        osmApi = OSMApi(mainRelationId=MAIN_RELATION_ID)
+        with patch("data.OSMApi.getJson", self.getJson):
+            osmApi.savePublicTransportRelation()
+        self.assertEqual(
+            self.urls,
+            [
+                f"{OPENSTREETMAP_API}/relation/{relationId}/full.json"
+                for relationId in [1, 2, 3]
+            ],
+        )
+        [routeMaster] = osmApi.getRoutes()
+        [route] = [member.element for member in routeMaster.members]
+        platform, way = [member.element for member in route.members]
+        self.assertEqual(
+            platform, Node("node", 10, PLATFORM_TAGS, lat=54.090, lon=18.790)
+        )
+        self.assertEqual(
+            way,
+            Way(
+                "way",
+                20,
+                dict(highway="primary"),
+                nodes=[
+                    Node("node", 100, dict(), lat=54.0901, lon=18.7901),
+                    Node("node", 101, dict(), lat=54.0925, lon=18.7950),
+                ],
+            ),
+        )
+        self.assertEqual(list(osmApi.getStops()), ["1"])
+
+    def test_fetchesMissingElementsInChunks(self):
+        osmApi = OSMApi(mainRelationId=MAIN_RELATION_ID)
+        with (
+            patch("data.OSMApi.getJson", self.getJson),
+            patch("data.OSMApi.MULTI_FETCH_CHUNK_SIZE", 2),
+        ):
+            way = osmApi.fetchWay(21)
+        self.assertEqual(
+            self.urls,
+            [
+                f"{OPENSTREETMAP_API}/ways.json?ways=21",
+                f"{OPENSTREETMAP_API}/nodes.json?nodes=102,103",
+                f"{OPENSTREETMAP_API}/nodes.json?nodes=104",
+            ],
+        )
+        self.assertEqual([node.id for node in way.nodes], [102, 103, 104])
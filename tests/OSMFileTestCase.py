@@ -0,0 +1,58 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from data.OSMFile import loadElementStore
+
+EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="54.09" lon="18.79"><tag k="highway" v="bus_stop"/></node>
+  <node id="2" lat="54.10" lon="18.80"/>
+  <node id="3" lat="54.11" lon="18.81"/>
+  <node id="4" lat="52.00" lon="21.00"/>
+  <way id="10"><nd ref="2"/><nd ref="3"/><tag k="highway" v="primary"/></way>
+  <way id="11"><nd ref="4"/></way>
+  <relation id="100">
+    <member type="relation" ref="101" role=""/>
+    <tag k="type" v="network"/>
+  </relation>
+  <relation id="101">
+    <member type="node" ref="1" role="platform"/>
+    <member type="way" ref="10" role=""/>
+    <tag k="type" v="route"/>
+  </relation>
+  <relation id="102"><member type="way" ref="11" role=""/></relation>
+</osm>
+"""
+
+
+class OSMFileTestCase(TestCase):
+    def test_loadsOnlyElementsReachableFromMainRelation(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "extract.osm"
+            path.write_text(EXTRACT)
+            elementStore = loadElementStore(path, mainRelationId=100)
+        self.assertEqual(list(elementStore.relationIds), [100, 101])
+        self.assertEqual(list(elementStore.wayIds), [10])
+        self.assertEqual(list(elementStore.nodeIds), [1, 2, 3])
+        self.assertEqual(
+            elementStore.relation(101),
+            (
+                dict(type="route"),
+                [("node", 1, "platform"), ("way", 10, "")],
+            ),
+        )
+        self.assertEqual(list(elementStore.way(10)[1]), [2, 3])
+        self.assertEqual(elementStore.node(1).tags, dict(highway="bus_stop"))
+
+    def test_findsChildRelationsListedBeforeTheirParent(self):
+        start = EXTRACT.index('  <relation id="100">')
+        end = EXTRACT.index('  <relation id="101">')
+        parent = EXTRACT[start:end]
+        extract = EXTRACT.replace(parent, "").replace("</osm>", parent + "</osm>")
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "extract.osm"
+            path.write_text(extract)
+            elementStore = loadElementStore(path, mainRelationId=100)
+        self.assertEqual(list(elementStore.relationIds), [101, 100])
+        self.assertEqual(list(elementStore.wayIds), [10])
@@ -0,0 +1,134 @@
+from unittest import TestCase
+
+import overpy
+
+from data.OSMConverter import OSMConverter
+from data.OSMElementStore import OSMElementStore
+from data.OSMOverpass import (
+    OSMOverpass,
+    _elementStoreFromGeometryJson,
+    _elementStoreFromResult,
+)
+
+MAIN_RELATION_ID = 1
+PLATFORM_TAGS = dict(highway="bus_stop", public_transport="platform", bus="yes")
+NODES = {
+    10: (54.090, 18.790, dict(PLATFORM_TAGS, ref="1", name="Dworzec")),
+    11: (54.096, 18.802, dict(PLATFORM_TAGS, ref="2", name="Rynek")),
+    100: (54.0901, 18.7901, dict()),
+    101: (54.0925, 18.7950, dict()),
+    102: (54.0940, 18.7990, dict(highway="traffic_signals")),
+    103: (54.0959, 18.8021, dict()),
+}
+WAYS = {20: [100, 101, 102], 21: [103, 102]}
+RELATIONS = {
+    1: ([("relation", 2, "")], dict(type="network")),
+    2: (
+        [("relation", 3, "")],
+        {
+            "type": "route_master",
+            "route_master": "bus",
+            "ref": "7",
+            "gtfs:route_id": "7",
+        },
+    ),
+    3: (
+        [
+            ("node", 10, "platform"),
+            ("way", 20, ""),
+            ("way", 21, ""),
+            ("node", 11, "platform"),
+        ],
+        {
+            "type": "route",
+            "route": "bus",
+            "ref": "7",
+            "name": "Bus 7: Dworzec => Rynek",
+            "gtfs:route_id": "7",
+            "gtfs:trip_id": "31",
+        },
+    ),
+}
+MEMBER_NODE_IDS = {10, 11}
+
+
+def node(nodeId: int) -> dict:
+    lat, lon, tags = NODES[nodeId]
+    return dict(type="node", id=nodeId, lat=lat, lon=lon, tags=tags)
+
+
+def relation(relationId: int) -> dict:
+    members, tags = RELATIONS[relationId]
+    return dict(
+        type="relation",
+        id=relationId,
+        members=[
+            dict(type=memberType, ref=ref, role=role)
+            for memberType, ref, role in members
+        ],
+        tags=tags,
+    )
+
+
+def bodyElements() -> list:
+    # "out body" of the relation and everything below it.
+    return (
+        [relation(relationId) for relationId in RELATIONS]
+        + [
+            dict(type="way", id=wayId, nodes=nodeIds, tags=dict(highway="primary"))
+            for wayId, nodeIds in WAYS.items()
+        ]
+        + [node(nodeId) for nodeId in NODES]
+    )
+
+
+def geometryElements() -> list:
+    # "out geom" ways carry their nodes only as coordinates.
+    return (
+        [relation(relationId) for relationId in RELATIONS]
+        + [
+            dict(
+                type="way",
+                id=wayId,
+                nodes=nodeIds,
+                geometry=[
+                    dict(lat=NODES[nodeId][0], lon=NODES[nodeId][1])
+                    for nodeId in nodeIds
+                ],
+                tags=dict(highway="primary"),
+            )
+            for wayId, nodeIds in WAYS.items()
+        ]
+        + [node(nodeId) for nodeId in sorted(MEMBER_NODE_IDS)]
+    )
+
+
+class FixtureOverpass(OSMOverpass):
+    def __init__(self, elementStore: OSMElementStore):
+        super().__init__(mainRelationId=MAIN_RELATION_ID)
+        self.fixtureElementStore = elementStore
+
+    def loadElementStore(self) -> OSMElementStore:
+        return self.fixtureElementStore
+
+
+class OSMOverpassTestCase(TestCase):
+    def test_geometryQueryGivesSameData(self):
+        bodyResult = overpy.Result.from_json(dict(elements=bodyElements()))
+        body = OSMConverter(FixtureOverpass(_elementStoreFromResult(bodyResult)))
+        geometry = OSMConverter(
+            FixtureOverpass(_elementStoreFromGeometryJson(geometryElements()))
+        )
+        bodyData = body.data()
+        geometryData = geometry.data()
+        self.assertEqual(bodyData.stops, geometryData.stops)
+        self.assertEqual(bodyData.routes, geometryData.routes)
+        self.assertEqual(
+            [variant.busStopIds for variant in bodyData.routeVariants.values()],
+            [variant.busStopIds for variant in geometryData.routeVariants.values()],
+        )
+        self.assertEqual(bodyData.shapes, geometryData.shapes)
+        self.assertEqual(
+            [(shape.shapeLat, shape.shapeLon) for shape in bodyData.shapes],
+            [NODES[nodeId][:2] for nodeId in [100, 101, 102, 103]],
+        )
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from data.OSMShapeBuilder import WayStitcher
+from data.OSMSource import Node, Way
+
+
+def node(nodeId: int) -> Node:
+    return Node(type="node", id=nodeId, tags=dict(), lat=54.0 + nodeId / 1000, lon=18.0)
+
+
+def way(wayId: int, nodeIds) -> Way:
+    return Way(
+        type="way", id=wayId, tags=dict(), nodes=[node(nodeId) for nodeId in nodeIds]
+    )
+
+
+def stitchedIds(ways) -> list:
+    return [node.id for node in WayStitcher(ways).stitch()]
+
+
+class OSMShapeBuilderTestCase(TestCase):
+    def test_orientsWaysAndDropsJunctionNodes(self):
+        ways = [way(1, [2, 1]), way(2, [2, 3, 4]), way(3, [6, 5, 4])]
+        self.assertEqual(stitchedIds(ways), [1, 2, 3, 4, 5, 6])
+
+    def test_membersOutOfOrder(self):
+        ways = [way(1, [1, 2]), way(3, [3, 4]), way(2, [2, 3])]
+        self.assertEqual(stitchedIds(ways), [1, 2, 3, 4])
+
+    def test_roundaboutLeftAtNextWay(self):
+        ways = [
+            way(1, [1, 2]),
+            way(2, [2, 10, 11, 12, 13, 2]),
+            way(3, [12, 20]),
+        ]
+        self.assertEqual(stitchedIds(ways), [1, 2, 10, 11, 12, 20])
+
+    def test_roundaboutLeftAtFollowingMember(self):
+        # Way 5 touches the ring before way 3, but way 3 is the next member.
+        ways = [
+            way(1, [1, 2]),
+            way(2, [2, 10, 11, 12, 13, 2]),
+            way(3, [12, 20]),
+            way(4, [20, 30]),
+            way(5, [30, 10]),
+        ]
+        self.assertEqual(stitchedIds(ways), [1, 2, 10, 11, 12, 20, 30, 10])
+
+    def test_gapKeepsNearerEndFirst(self):
+        stitcher = WayStitcher([way(1, [1, 2]), way(2, [9, 4])])
+        self.assertEqual([node.id for node in stitcher.stitch()], [1, 2, 4, 9])
+        self.assertEqual(stitcher.gaps, 1)
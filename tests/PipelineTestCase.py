@@ -0,0 +1,29 @@
+from threading import Barrier
+from unittest import TestCase
+
+from pipeline import Pipeline
+
+
+class PipelineTestCase(TestCase):
+    def test_independentStagesRunConcurrently(self):
+        # Would time out if the branches ran one after the other.
+        barrier = Barrier(2, timeout=5)
+
+        def branch(value: int) -> int:
+            barrier.wait()
+            return value
+
+        pipeline = Pipeline()
+        pipeline.add("left", lambda: branch(2))
+        pipeline.add("right", lambda: branch(3))
+        pipeline.add(
+            "merge", lambda left, right: left * right, dependencies=["left", "right"]
+        )
+        self.assertEqual(pipeline.run()["merge"], 6)
+
+    def test_failurePropagates(self):
+        pipeline = Pipeline()
+        pipeline.add("fail", lambda: 1 / 0)
+        pipeline.add("after", lambda value: value, dependencies=["fail"])
+        with self.assertRaises(ZeroDivisionError):
+            pipeline.run()
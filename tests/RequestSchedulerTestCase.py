@@ -0,0 +1,63 @@
+import asyncio
+from unittest import TestCase
+
+import httpx
+
+from data.RequestScheduler import ErrorBudgetExceeded, RequestScheduler
+
+
+def scheduler(errorBudget: int) -> RequestScheduler:
+    return RequestScheduler(
+        name="test",
+        ratePerSecond=1000.0,
+        burst=1000,
+        maxRetries=0,
+        backoffBaseSeconds=0.0,
+        backoffMaxSeconds=0.0,
+        errorBudget=errorBudget,
+    )
+
+
+class RequestSchedulerTestCase(TestCase):
+    def test_errorBudgetStopsPendingRequests(self):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url)
+            return httpx.Response(500)
+
+        requestScheduler = scheduler(errorBudget=2)
+
+        async def fetchAll():
+            transport = httpx.MockTransport(handler)
+            async with httpx.AsyncClient(transport=transport) as client:
+
+                async def get(number: int):
+                    response = await client.get(f"https://example.com/{number}")
+                    response.raise_for_status()
+
+                await requestScheduler.gatherAsync(
+                    requestScheduler.runAsync(lambda number=number: get(number))
+                    for number in range(200)
+                )
+
+        with self.assertRaises(ErrorBudgetExceeded):
+            asyncio.run(fetchAll())
+        self.assertEqual(len(calls), 3)
+
+    def test_failuresWithinBudgetAreReturned(self):
+        requestScheduler = scheduler(errorBudget=1)
+
+        async def succeed():
+            return 1
+
+        async def fail():
+            raise httpx.ConnectError("down")
+
+        results = asyncio.run(
+            requestScheduler.gatherAsync(
+                [requestScheduler.runAsync(succeed), requestScheduler.runAsync(fail)]
+            )
+        )
+        self.assertEqual(results[0], 1)
+        self.assertIsInstance(results[1], httpx.ConnectError)